@@ -2,7 +2,7 @@ import asyncio
 import logging
 import traceback
 
-from . import kubernetes, prometheus
+from . import kubernetes, metrics, prometheus
 from .beachball import BeachballScene
 from .deck import Deck, Scene
 from .keys import (
@@ -24,6 +24,9 @@ from .rabbitmq import RabbitMQScene
 
 DEBUG = False
 
+# Serve instrumentation at http://127.0.0.1:METRICS_PORT/metrics, if set.
+METRICS_PORT = None
+
 
 class HackKey(Key):
     def __init__(self, n):
@@ -116,12 +119,18 @@ class InitialScene(Scene):
 
 
 async def init():
-    await kubernetes.load_all()
+    # Get pixels up first, the clusters connect in the background and keys that need
+    # them wait until they are ready.
     deck = Deck.get()
     deck.push_scene(InitialScene())
+    kubernetes.start_all()
+    if METRICS_PORT is not None:
+        await metrics.serve(port=METRICS_PORT)
+        asyncio.ensure_future(metrics.monitor_loop_lag())
 
 
 def handle_exception(loop, context):
+    metrics.LOOP_EXCEPTIONS.inc()
     if "exception" in context:
         exc = context["exception"]
         traceback.print_tb(exc.__traceback__)
@@ -0,0 +1,124 @@
+import glob
+import os
+import threading
+
+from typing import Optional
+
+from PIL import Image, ImageFont
+
+from .utils.cache import LRUCache
+
+
+# Where to look for relative asset paths like "img/logo.png", in order. The working
+# directory comes first to match how the assets were always loaded, then the package
+# itself and finally the source checkout it lives in.
+DEFAULT_ROOTS = [
+    "",
+    os.path.dirname(__file__),
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+]
+
+
+class AssetStore:
+    """Lazily loads images and fonts, sharing one copy of each across every key.
+
+    Derived images (scaled to a key size, composited over a background) are cached
+    too, so a key only pays for loading the first time it is drawn on a given deck.
+    """
+
+    def __init__(self, roots: Optional[list[str]] = None, cache_size: int = 256):
+        self.roots = DEFAULT_ROOTS if roots is None else roots
+        self._paths = {}
+        self._images = {}
+        self._fonts = {}
+        self._derived = LRUCache(cache_size)
+        # Keys may be drawn from render pool threads.
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        """Resolve a relative asset name against the search roots."""
+        if os.path.isabs(name):
+            return name
+        path = self._paths.get(name)
+        if path is not None:
+            return path
+        for root in self.roots:
+            path = os.path.join(root, name)
+            if os.path.exists(path):
+                self._paths[name] = path
+                return path
+        raise FileNotFoundError(f"Asset {name!r} not found in {self.roots}")
+
+    def glob(self, pattern: str) -> list[str]:
+        """Expand a glob in the first search root with any matches."""
+        if os.path.isabs(pattern):
+            return sorted(glob.glob(pattern))
+        for root in self.roots:
+            paths = glob.glob(os.path.join(root, pattern))
+            if paths:
+                return sorted(paths)
+        return []
+
+    def image(self, name: str, mode: str = "RGB") -> Image.Image:
+        """Load an image. The result is shared so must not be modified."""
+        path = self.path(name)
+        with self._lock:
+            image = self._images.get((path, mode))
+            if image is None:
+                image = Image.open(path).convert(mode)
+                self._images[(path, mode)] = image
+            return image
+
+    def font(self, name: str, size: int) -> ImageFont.FreeTypeFont:
+        path = self.path(name)
+        with self._lock:
+            font = self._fonts.get((path, size))
+            if font is None:
+                font = ImageFont.truetype(path, size)
+                self._fonts[(path, size)] = font
+            return font
+
+    def scaled(self, name: str, size: tuple[int, int]) -> Image.Image:
+        """An image shrunk to fit inside size, keeping its aspect ratio."""
+
+        def build():
+            image = self.image(name).copy()
+            image.thumbnail(size)
+            return image
+
+        return self._derive(("scaled", name, tuple(size)), build)
+
+    def resized(self, name: str, size: tuple[int, int]) -> Image.Image:
+        """An image stretched to exactly size."""
+        return self._derive(
+            ("resized", name, tuple(size)), lambda: self.image(name).resize(size)
+        )
+
+    def composite(self, name: str, size: tuple[int, int], background) -> Image.Image:
+        """An image with transparency centered over a solid background of size."""
+
+        def build():
+            image = self.image(name, "RGBA")
+            canvas = Image.new("RGBA", size, background)
+            canvas.alpha_composite(
+                image,
+                (
+                    (canvas.width - image.width) // 2,
+                    (canvas.height - image.height) // 2,
+                ),
+            )
+            return canvas.convert("RGB")
+
+        return self._derive(("composite", name, tuple(size), background), build)
+
+    def _derive(self, key: tuple, build) -> Image.Image:
+        with self._lock:
+            image = self._derived.get(key)
+        if image is None:
+            image = build()
+            with self._lock:
+                self._derived[key] = image
+        return image
+
+
+assets = AssetStore()
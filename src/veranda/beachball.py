@@ -1,15 +1,17 @@
 import asyncio
-import time
-
-from PIL import Image
 
 from .deck import Deck, Scene
 from .keys import MultiKey, PopSceneKey
+from .sprites import SpriteAnimation
 
 
 class BeachballScene(Scene):
+    # Degrees per second.
     speed = 180
 
+    # Rotation steps per turn, more is smoother but takes longer to prepare.
+    steps = 36
+
     keys = {
         2: MultiKey(
             key=PopSceneKey(), image="img/gradient_circle.png", height=4, width=4
@@ -35,12 +37,6 @@ class BeachballScene(Scene):
         super().unmount(deck)
 
     async def update(self, deck: Deck):
-        start_time = time.monotonic()
         key: MultiKey = self[2]
-        start_img = key._image
-        while True:
-            elapsed = time.monotonic() - start_time
-            rotation = (elapsed * self.speed * -1) % 360
-            img = start_img.rotate(rotation, Image.BILINEAR)
-            key.draw(deck, 2, image=img)
-            await asyncio.sleep(0.05)
+        sprite = SpriteAnimation.rotation(key._image, self.steps, 2)
+        await sprite.play(deck, 360 / self.speed)
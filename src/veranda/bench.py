@@ -0,0 +1,281 @@
+"""Render benchmarks which run against a VirtualStreamDeck, no hardware needed.
+
+    python -m veranda.bench --save-baseline bench.json
+    python -m veranda.bench --baseline bench.json
+
+Results are printed as JSON. With --baseline, any metric that got worse by more than
+--tolerance is reported and the exit status is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+import tracemalloc
+
+from typing import Callable, Optional
+
+from .assets import assets
+from .beachball import BeachballScene
+from .deck import Deck, Scene
+from .keys import AnimatedKey, MenuKey, MultiKey, SparklineKey, TextKey, ToggleKey
+
+
+MODELS = ("mini", "original", "xl")
+
+# Seconds between latency probe presses, long enough to clear debouncing and menu
+# transitions.
+PROBE_INTERVAL = 0.45
+
+# Simulated time for each USB key image write, in seconds.
+WRITE_LATENCY = 0.001
+
+# Metrics where a bigger number is a regression, and where a smaller one is.
+HIGHER_IS_WORSE = (
+    "cpu_ms_per_frame",
+    "bytes_per_second",
+    "peak_kib",
+    "latency_ms_p50",
+    "latency_ms_p95",
+)
+LOWER_IS_WORSE = ("fps",)
+
+BENCHMARKS = {}
+
+
+def benchmark(fn: Callable) -> Callable:
+    """Register a benchmark.
+
+    It is called with a fresh deck, sets up the load to measure and returns the index
+    to press for latency probes plus an optional coroutine to keep running. The probe
+    key is pressed every PROBE_INTERVAL while measuring, and must repaint its key.
+    """
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def _probe_key() -> ToggleKey:
+    # Flips between two labels on every press, so each press must repaint.
+    return ToggleKey([TextKey("A"), TextKey("B")])
+
+
+async def _every_frame(fn: Callable[[int], None]) -> None:
+    frame = 0
+    while True:
+        fn(frame)
+        frame += 1
+        await asyncio.sleep(1 / 60)
+
+
+@benchmark
+def text(deck: Deck):
+    deck[0] = _probe_key()
+    keys = {}
+    for index in range(1, deck.key_count):
+        keys[index] = deck[index] = TextKey("0", label="Value")
+
+    def update(frame):
+        for index, key in keys.items():
+            key._text = str(frame * index)
+            key.draw(deck, index)
+
+    return 0, _every_frame(update)
+
+
+@benchmark
+def sparkline(deck: Deck):
+    deck[0] = _probe_key()
+    keys = {}
+    for index in range(1, deck.key_count):
+        keys[index] = deck[index] = SparklineKey([0, 0])
+
+    def update(frame):
+        for index, key in keys.items():
+            key._values = [
+                math.sin((frame + index + i) / 20) for i in range(0, 2000, 10)
+            ]
+            key.draw(deck, index)
+
+    return 0, _every_frame(update)
+
+
+@benchmark
+def animated(deck: Deck):
+    deck[0] = _probe_key()
+    for index in range(1, deck.key_count):
+        deck[index] = AnimatedKey("img/kart.gif" if index % 2 else "img/taco.gif")
+    return 0, None
+
+
+@benchmark
+def multi(deck: Deck):
+    deck[0] = _probe_key()
+    key = deck[1] = MultiKey()
+    gradient = assets.image("img/gradient.png")
+
+    def update(frame):
+        key.draw(deck, 1, image=gradient.rotate(frame % 360))
+
+    return 0, _every_frame(update)
+
+
+@benchmark
+def beachball(deck: Deck):
+    scene = BeachballScene()
+    scene[0] = _probe_key()
+    deck.push_scene(scene)
+    return 0, None
+
+
+@benchmark
+def menu(deck: Deck):
+    # Each probe press transitions to the other scene.
+    back = Scene()
+    back[0] = MenuKey(TextKey("Back"))
+    root = Scene()
+    root[0] = MenuKey(TextKey("Go"), back)
+    deck.push_scene(root)
+    return 0, None
+
+
+async def _probe(deck: Deck, index: int, latencies: list[float]) -> None:
+    """Press index forever, recording how long until that key is repainted."""
+    device = deck._deck
+    while True:
+        await asyncio.sleep(PROBE_INTERVAL)
+        start = time.monotonic()
+        seen = len(device.frames)
+        await device.press(index)
+        await device.release(index)
+        while time.monotonic() - start < PROBE_INTERVAL:
+            hit = next((f for f in device.frames[seen:] if f[1] == index), None)
+            if hit is not None:
+                latencies.append(hit[0] - start)
+                break
+            await asyncio.sleep(0.001)
+
+
+async def run(name: str, model: str, duration: float = 3.0) -> dict:
+    """Run one benchmark on one deck model and return its measurements."""
+    deck = Deck.virtual(model, write_latency=WRITE_LATENCY)
+    device = deck._deck
+    probe, driver = BENCHMARKS[name](deck)
+    tasks = [asyncio.ensure_future(driver)] if driver is not None else []
+    latencies = []
+    try:
+        # Let mounting and first draws settle.
+        await asyncio.sleep(0.25)
+        tasks.append(asyncio.ensure_future(_probe(deck, probe, latencies)))
+        stats = deck.render_stats()
+        bytes_written = device.bytes_written
+        cpu = time.process_time()
+        start = time.monotonic()
+        await asyncio.sleep(duration)
+        elapsed = time.monotonic() - start
+        cpu = time.process_time() - cpu
+        flushes = deck.render_stats()["flushes"] - stats["flushes"]
+        writes = deck.render_stats()["frames_written"] - stats["frames_written"]
+        bytes_written = device.bytes_written - bytes_written
+
+        # Separately, as tracing slows everything down.
+        tracemalloc.start()
+        await asyncio.sleep(duration / 2)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        for task in tasks:
+            task.cancel()
+        deck.close()
+    latencies.sort()
+    return {
+        "benchmark": name,
+        "model": model,
+        "keys": deck.key_count,
+        "fps": flushes / elapsed,
+        "writes_per_second": writes / elapsed,
+        "bytes_per_second": bytes_written / elapsed,
+        "cpu_ms_per_frame": cpu * 1000 / max(flushes, 1),
+        "peak_kib": peak / 1024,
+        "latency_ms_p50": statistics.median(latencies) * 1000 if latencies else None,
+        "latency_ms_p95": (
+            latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None
+        ),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Return a description of every metric that regressed past tolerance."""
+    previous = {(r["benchmark"], r["model"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result["benchmark"], result["model"]))
+        if old is None:
+            continue
+        for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not old_value:
+                # Nothing to compare against.
+                continue
+            if new_value is None:
+                # E.g. the probe key never repainted at all.
+                regressions.append(
+                    f"{result['benchmark']}/{result['model']} {metric}: "
+                    f"{old_value:.2f} -> none"
+                )
+                continue
+            change = (new_value - old_value) / old_value
+            if metric in LOWER_IS_WORSE:
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{result['benchmark']}/{result['model']} {metric}: "
+                    f"{old_value:.2f} -> {new_value:.2f} ({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m veranda.bench", description=__doc__
+    )
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"any of {', '.join(BENCHMARKS)}, default all"
+    )
+    parser.add_argument("--model", action="append", choices=MODELS)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--baseline", help="compare against results in this file")
+    parser.add_argument("--save-baseline", help="write results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    async def run_all():
+        return [
+            await run(name, model, args.duration)
+            for name in args.benchmarks or BENCHMARKS
+            for model in args.model or MODELS
+        ]
+
+    results = asyncio.run(run_all())
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import atexit
 import copy
+import functools
 import time
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
 from PIL import Image
 from StreamDeck.DeviceManager import DeviceManager
-from StreamDeck.ImageHelpers.PILHelper import to_native_format
+
+from .metrics import CALLBACK_SECONDS
+from .render import FrameWriter, RenderPool, RenderScheduler
+from .utils.cache import LRUCache
+from .utils.tasks import TickScheduler
+from .virtual import VirtualStreamDeck
 
 
 if TYPE_CHECKING:
@@ -72,6 +79,23 @@ class Deck:
     # Pixels between keys in the Y direction.
     Y_PADDING = X_PADDING
 
+    # Maximum key image refreshes per second, or 0 to write every image immediately.
+    TARGET_FPS = 30
+
+    # Number of encoded key images to keep for reuse.
+    IMAGE_CACHE_SIZE = 256
+
+    # Largest per-channel pixel difference for a key image to count as unchanged and
+    # not be rewritten, or 0 to only skip identical images.
+    DIFF_TOLERANCE = 0
+
+    # Number of unmounted scenes to keep pre-rendered key images for.
+    PRELOAD_CACHE_SIZE = 16
+
+    # Worker threads for drawing and encoding key images, or 0 to do it all inline on
+    # the event loop.
+    RENDER_WORKERS = 0
+
     @classmethod
     def enumerate(cls):
         return [cls(deck) for deck in DeviceManager().enumerate()]
@@ -83,11 +107,28 @@ class Deck:
             raise ValueError(f"Did not find exactly one deck: {decks}")
         return decks[0]
 
+    @classmethod
+    def virtual(cls, model: str = "xl", **kwargs) -> "Deck":
+        """Create a deck backed by an in-memory VirtualStreamDeck instead of hardware."""
+        return cls(VirtualStreamDeck(model, **kwargs))
+
     def __init__(self, deck):
         self._deck = deck
+        self._writer = FrameWriter(deck, self.IMAGE_CACHE_SIZE, self.DIFF_TOLERANCE)
+        self._pool = RenderPool(self._apply_render, self.RENDER_WORKERS)
+        self._renderer = RenderScheduler(
+            self._writer.write, self.TARGET_FPS, self._pool.executor
+        )
+        # Shared timer for keys' periodic work.
+        self.ticks = TickScheduler()
         self._scenes = [Scene()]
         self._scenes[0].mount(self)
         self._debounce_times = {}
+        self._tile_rects = {}
+        self._preloaded = LRUCache(self.PRELOAD_CACHE_SIZE)
+        self._preloading = {}
+        # Pre-rendered images for the scene being mounted, used by render().
+        self._mounting = {}
 
         # Open the connection!
         self._deck.open()
@@ -96,6 +137,7 @@ class Deck:
         self.key_count = deck.key_count()
         self.key_layout = deck.key_layout()
         self.key_size = deck.key_image_format()["size"]
+        self.brightness = None
 
         # Initialize the display and hooks.
         self.clear()
@@ -103,9 +145,164 @@ class Deck:
         atexit.register(self.close)
 
     def set_key_image(self, index, image):
-        if isinstance(image, Image.Image):
-            image = to_native_format(self._deck, image)
-        self._deck.set_key_image(index, image)
+        # Anything still rendering for this key is now out of date.
+        self._pool.invalidate(index)
+        self._renderer.schedule(index, image)
+
+    def set_key_images(self, images: dict[int, Any]) -> None:
+        """Set several key images at once, they are flushed to the device together."""
+        for index, image in images.items():
+            self.set_key_image(index, image)
+
+    def blit(self, image: Image.Image, origin_index: int = 0) -> None:
+        """Show a canvas spanning several keys, with its top-left corner at origin_index."""
+        self.set_key_images(self.tiles(image, origin_index))
+
+    def tiles(
+        self, image: Image.Image, origin_index: int = 0
+    ) -> dict[int, Image.Image]:
+        """Slice a canvas laid out like key_rect() into per-key images.
+
+        Only keys right of and below origin_index whose rect starts inside the canvas
+        are included. This only reads the deck geometry so is safe on the render pool.
+        """
+        rects = self._tile_rects.get((origin_index, image.size))
+        if rects is None:
+            origin_x = origin_index % self.key_layout[1]
+            offset_x, offset_y, _, _ = self.key_rect(origin_index)
+            rects = {}
+            for index in range(origin_index, self.key_count):
+                if index % self.key_layout[1] < origin_x:
+                    continue
+                left, top, right, bottom = self.key_rect(index)
+                if left - offset_x >= image.width or top - offset_y >= image.height:
+                    continue
+                rects[index] = (
+                    left - offset_x,
+                    top - offset_y,
+                    right - offset_x,
+                    bottom - offset_y,
+                )
+            self._tile_rects[(origin_index, image.size)] = rects
+        return {index: image.crop(rect) for index, rect in rects.items()}
+
+    def render(self, index: int, fn: Callable[..., Any], *args) -> None:
+        """Draw a key with `fn(*args)` and show the result at index.
+
+        fn returns either an image for index or a dict of {index: image} when it draws
+        several keys at once. It runs on the render pool when RENDER_WORKERS is set, so
+        it must not touch the deck other than to read its geometry.
+        """
+        # Not popped, a wrapped key draws again when the inner key mounts.
+        preloaded = self._mounting.get(index)
+        if preloaded is not None and preloaded[0] == fn and args == (self,):
+            self._pool.invalidate(index)
+            self._apply_render(index, preloaded[1])
+            return
+        self._pool.submit(index, fn, *args)
+
+    def preload(self, scene: Scene) -> None:
+        """Render a scene's keys in the background, so showing it later is just a write.
+
+        Only keys drawn with `render(deck)` (or wrapping one) are pre-rendered. The
+        images are used the next time the scene is mounted, and dropped then too as
+        keys can change while mounted.
+        """
+        if (
+            scene._deck is not None
+            or scene in self._preloaded
+            or scene in self._preloading
+        ):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        renders = {}
+        for index, key in scene._keys.items():
+            # Look through wrappers like MenuKey for the key doing the drawing.
+            while key is not None and not hasattr(key, "render"):
+                key = key._key
+            if key is not None:
+                renders[index] = key.render
+        future = self.run_in_executor(self._preload_renders, renders)
+        self._preloading[scene] = future
+        future.add_done_callback(functools.partial(self._preloaded_scene, scene))
+
+    def run_in_executor(self, fn: Callable[..., Any], *args) -> asyncio.Future:
+        """Run fn(*args) off the event loop, on the render pool if there is one."""
+        return asyncio.get_running_loop().run_in_executor(
+            self._pool.executor, fn, *args
+        )
+
+    def warm(self, fn: Callable[..., Any], *args) -> Optional[asyncio.Future]:
+        """Run fn(*args) in the background to fill a cache, without waiting on it.
+
+        Failures go to the loop's exception handler. Does nothing if no loop is running.
+        """
+        try:
+            future = self.run_in_executor(fn, *args)
+        except RuntimeError:
+            return None
+        future.add_done_callback(self._warmed)
+        return future
+
+    @staticmethod
+    def _warmed(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            future.get_loop().call_exception_handler(
+                {
+                    "message": "Exception warming a cache",
+                    "exception": future.exception(),
+                    "future": future,
+                }
+            )
+
+    def _preload_renders(self, renders: dict[int, Callable]) -> dict[int, tuple]:
+        images = {}
+        for index, fn in renders.items():
+            result = RenderPool._run(fn, self)
+            for image in result.values() if isinstance(result, dict) else [result]:
+                self._writer.prepare(image)
+            images[index] = (fn, result)
+        return images
+
+    def _preloaded_scene(self, scene: Scene, future: asyncio.Future) -> None:
+        del self._preloading[scene]
+        if future.cancelled():
+            return
+        images = future.result()
+        # Already shown before we finished, the images may be out of date.
+        if scene._deck is None:
+            self._preloaded[scene] = images
+
+    def _mount_scene(self, scene: Scene) -> None:
+        self._mounting = self._preloaded.pop(scene, {})
+        try:
+            scene.mount(self)
+        finally:
+            self._mounting = {}
+
+    def _apply_render(self, index, result):
+        # Not through set_key_image(), that would mark newer renders still in flight
+        # for the key as stale.
+        if isinstance(result, dict):
+            for sub_index, image in result.items():
+                self._renderer.schedule(sub_index, image)
+        else:
+            self._renderer.schedule(index, result)
+
+    def flush(self) -> None:
+        """Write any pending key images without waiting for the next frame tick."""
+        self._renderer.flush()
+
+    def render_stats(self) -> dict[str, int]:
+        """Return counters describing how much rendering work has been saved."""
+        return {
+            "flushes": self._renderer.flushes,
+            "frames_dropped": self._renderer.frames_dropped,
+            **self._writer.stats(),
+        }
 
     def key_image_format(self):
         return self._deck.key_image_format()
@@ -124,12 +321,18 @@ class Deck:
             ((y + 1) * padded_y) - self.Y_PADDING,  # bottom
         )
 
+    def canvas_size(self) -> tuple[int, int]:
+        """Return the size of an image covering every key in key_rect() coordinates."""
+        _, _, right, bottom = self.key_rect(self.key_count - 1)
+        return (right, bottom)
+
     def clear(self, brightness: float = 1.0):
         for i in range(self.key_count):
             self.set_key_image(i, None)
         self.set_brightness(brightness)
 
     def set_brightness(self, brightness: float):
+        self.brightness = brightness
         self._deck.set_brightness(brightness)
 
     def __getitem__(self, index):
@@ -141,14 +344,14 @@ class Deck:
     def push_scene(self, scene):
         self._scenes[-1].unmount(self)
         self._scenes.append(scene)
-        scene.mount(self)
+        self._mount_scene(scene)
 
     def pop_scene(self, n: int = 1):
         if len(self._scenes) <= n:
             raise Exception("No scene to pop")
         self._scenes[-1].unmount(self)
         del self._scenes[-1 * n :]
-        self._scenes[-1].mount(self)
+        self._mount_scene(self._scenes[-1])
 
     def replace_scene(self, scene: Scene) -> None:
         """Pop and push a new scene without running the intermediary mounts."""
@@ -157,7 +360,7 @@ class Deck:
         self._scenes[-1].unmount(self)
         self._scenes.pop(-1)
         self._scenes.append(scene)
-        scene.mount(self)
+        self._mount_scene(scene)
 
     async def callback(self, _deck, index, state):
         # Check for a debounce timer.
@@ -172,9 +375,12 @@ class Deck:
         key = self._scenes[-1][index]
         if key is not None:
             fn = key.on_press if state else key.on_release
-            await fn(self, index)
+            with CALLBACK_SECONDS.time():
+                await fn(self, index)
 
     def close(self):
         self._scenes[-1].close()
+        self.flush()
+        self._pool.shutdown()
         self._deck.set_brightness(0)
         self._deck.close()
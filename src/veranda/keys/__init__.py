@@ -5,10 +5,12 @@ from .menu import MenuKey, PopSceneKey  # noqa F401
 from .multi import MultiKey  # noqa F401
 from .power import PowerKey  # noqa F401
 from .prometheus import (  # noqa F401
+    PrometheusGroupKey,
     PrometheusKey,
     PrometheusSingleStatKey,
     PrometheusSparklineKey,
 )
+from .stream import StreamKey, StreamSparklineKey, StreamTextKey  # noqa F401
 from .text import TextKey  # noqa F401
 from .toggle import ToggleKey  # noqa F401
 from .url import GrafanaExploreURLKey, URLKey  # noqa F401
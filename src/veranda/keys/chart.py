@@ -1,10 +1,54 @@
-from PIL import ImageDraw
+import numbers
+
+from typing import Optional, Sequence
+
+from PIL import Image, ImageDraw
 from StreamDeck.ImageHelpers.PILHelper import create_image
 
 from ..deck import Deck
 from .base import NOT_PRESENT, Key
 
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _min(values: Sequence[float]) -> float:
+    return float(numpy.min(values)) if numpy is not None else min(values)
+
+
+def _max(values: Sequence[float]) -> float:
+    return float(numpy.max(values)) if numpy is not None else max(values)
+
+
+def downsample(values: Sequence[float], buckets: int) -> tuple[list, list]:
+    """Reduce values to the min and max of each of buckets equal slices.
+
+    Returns (positions, values) with positions from 0.0 to 1.0 across the series, so a
+    line through them keeps every peak and trough visible at buckets pixels wide.
+    Series that already fit are returned as-is.
+    """
+    count = len(values)
+    if count <= buckets:
+        return [i / max(count - 1, 1) for i in range(count)], list(values)
+    if numpy is not None:
+        array = numpy.asarray(values, dtype=float)
+        starts = numpy.linspace(0, count, buckets, endpoint=False).astype(int)
+        mins = numpy.minimum.reduceat(array, starts)
+        maxes = numpy.maximum.reduceat(array, starts)
+        positions = numpy.repeat(numpy.linspace(0.0, 1.0, buckets), 2)
+        return positions, numpy.column_stack((mins, maxes)).ravel()
+    positions, reduced = [], []
+    for bucket in range(buckets):
+        chunk = values[bucket * count // buckets : (bucket + 1) * count // buckets]
+        position = bucket / (buckets - 1)
+        positions += [position, position]
+        reduced += [min(chunk), max(chunk)]
+    return positions, reduced
+
+
 class SparklineKey(Key):
     def __init__(
         self,
@@ -14,10 +58,19 @@ class SparklineKey(Key):
         draw_height=50,
         line_width=1,
         color="white",
+        colors: Optional[list] = None,
         background_upper="black",
         background_lower="red",
+        ymin: Optional[float] = None,
+        ymax: Optional[float] = None,
         **kwargs,
     ):
+        """values is either one series or a list of series, each drawn as a line.
+
+        The area under the first series is filled with background_lower. colors gives
+        the line color for each series, otherwise they all use color. ymin and ymax
+        fix the vertical scale instead of fitting it to the values.
+        """
         super().__init__(**kwargs)
         self._values = values
         self._label = label
@@ -25,6 +78,9 @@ class SparklineKey(Key):
         self._draw_height = draw_height
         self._line_width = line_width
         self._color = color
+        self._colors = colors
+        self._ymin = ymin
+        self._ymax = ymax
         self._background_upper = background_upper
         self._background_lower = background_lower
 
@@ -35,35 +91,60 @@ class SparklineKey(Key):
         self.draw(deck, index)
 
     def draw(self, deck: Deck, index: int) -> None:
+        deck.render(index, self.render, deck)
+
+    def render(self, deck: Deck) -> Image.Image:
         image = create_image(deck, self._background_upper)
         draw = ImageDraw.Draw(image)
+        series = self._series()
         yoffset = (image.height - self._draw_height) // 2
-        minval = min(self._values)
-        maxoffset = max(self._values) - minval
+        minval = self._ymin
+        if minval is None:
+            minval = min(_min(values) for values in series)
+        maxval = self._ymax
+        if maxval is None:
+            maxval = max(_max(values) for values in series)
+        maxoffset = maxval - minval
         if maxoffset == 0:
             maxoffset = 1
-        ys = [
-            int(
-                # Scaled to 1.0-0.0
-                (1.0 - ((v - minval) / maxoffset))
-                # Scaled to 0-draw_height
-                * self._draw_height
-                # To absolute Y.
-                + yoffset
+        for i, values in enumerate(series):
+            positions, values = downsample(values, image.width)
+            coords = self._coords(
+                positions, values, minval, maxoffset, image.width, yoffset
             )
-            for v in self._values
-        ]
-        xstep = image.width / (len(self._values) - 1)
-        xs = [int(xstep * i) for i in range(len(self._values))]
-        coords = list(zip(xs, ys))
-        # Draw the bottom section.
-        draw.polygon(
-            coords + [(image.width, image.height), (0, image.height)],
-            self._background_lower,
-        )
-        # Draw the line.
-        draw.line(coords, self._color, self._line_width, "curve")
-        deck.set_key_image(index, image)
+            if i == 0:
+                # Draw the bottom section.
+                draw.polygon(
+                    coords + [image.width, image.height, 0, image.height],
+                    self._background_lower,
+                )
+            color = self._color if self._colors is None else self._colors[i]
+            # Draw the line.
+            draw.line(coords, color, self._line_width, "curve")
+        return image
+
+    def _series(self) -> list[Sequence[float]]:
+        if len(self._values) and isinstance(self._values[0], numbers.Real):
+            return [self._values]
+        return self._values
+
+    def _coords(self, positions, values, minval, maxoffset, width, yoffset) -> list:
+        """Convert positions and values to a flat [x0, y0, x1, y1, ...] pixel list."""
+        if numpy is not None:
+            xs = numpy.asarray(positions, dtype=float) * width
+            ys = numpy.asarray(values, dtype=float)
+            # Scaled to 1.0-0.0, then to 0-draw_height, then to absolute Y.
+            ys = (1.0 - ((ys - minval) / maxoffset)) * self._draw_height + yoffset
+            if self._ymin is not None or self._ymax is not None:
+                ys = ys.clip(yoffset, yoffset + self._draw_height)
+            return numpy.column_stack((xs, ys)).astype(int).ravel().tolist()
+        coords = []
+        for position, value in zip(positions, values):
+            y = (1.0 - ((value - minval) / maxoffset)) * self._draw_height + yoffset
+            if self._ymin is not None or self._ymax is not None:
+                y = min(max(y, yoffset), yoffset + self._draw_height)
+            coords += [int(position * width), int(y)]
+        return coords
 
     # async def on_press(self, deck, index):
     #     # FOR TESTING
@@ -1,53 +1,90 @@
-import asyncio
-import glob
+import bisect
 import itertools
+import os
+import time
 
 from PIL import Image, ImageSequence
 from StreamDeck.ImageHelpers.PILHelper import to_native_format
 
+from ..assets import assets
 from ..deck import Deck
+from ..render import format_key, frame_cache
 from .base import Key
 
 
 class ImageKey(Key):
     def __init__(self, image, **kwargs):
         super().__init__(**kwargs)
-        if isinstance(image, str):
-            image = Image.open(image).convert("RGB")
+        # Paths are loaded through the asset store on first draw.
         self._image = image
 
     def draw(self, deck, index):
-        deck.set_key_image(index, self._image)
+        image = self._image
+        if isinstance(image, str):
+            image = assets.scaled(image, deck.key_size)
+        deck.set_key_image(index, image)
 
 
 class AnimatedKey(Key):
+    # Shortest time between frame checks, in seconds.
+    min_tick_period = 1 / 60
+
     def __init__(self, paths: list[str], speed=None, **kwargs):
         super().__init__(**kwargs)
         # Expand a single glob.
         if isinstance(paths, str):
-            paths = glob.glob(paths)
-            paths.sort()
+            paths = assets.glob(paths)
+        else:
+            paths = [assets.path(p) for p in paths]
+        self._paths = tuple(paths)
+        self._is_gif = len(paths) == 1 and paths[0].endswith(".gif")
+        self._speed = speed or (1 if self._is_gif else 50)
+        self._native_frames = None
+        # When each frame ends, in seconds from the start of a loop.
+        self._frame_ends = None
+        self._frame = None
+
+    def _load_frames(self):
         # Load a GIF.
-        if len(paths) == 1 and paths[0].endswith(".gif"):
-            speed = speed or 1
+        if self._is_gif:
             frame_source = (
-                (f, f.info["duration"] / speed)
-                for f in ImageSequence.Iterator(Image.open(paths[0]))
+                (f, f.info["duration"] / self._speed)
+                for f in ImageSequence.Iterator(Image.open(self._paths[0]))
             )
         else:
-            speed = speed or 50
-            frame_source = ((Image.open(p), speed) for p in paths)
-        self._frames = [(f.convert("RGB"), d) for f, d in frame_source]
-        self._task = None
+            frame_source = ((Image.open(p), self._speed) for p in self._paths)
+        return ((f.convert("RGB"), d) for f, d in frame_source)
 
     def mount(self, deck: Deck, index: int):
-        self._native_frames = itertools.cycle(
-            (to_native_format(deck._deck, f), d) for f, d in self._frames
+        # Encoded frames are shared between every key showing the same source on
+        # the same kind of deck, so only the first mount pays for the conversion.
+        cache_key = (
+            "animated",
+            self._paths,
+            tuple(os.path.getmtime(p) for p in self._paths),
+            format_key(deck.key_image_format()),
+            self._speed,
+        )
+        frames = frame_cache.get(
+            cache_key,
+            lambda: [
+                (to_native_format(deck._deck, f), d) for f, d in self._load_frames()
+            ],
         )
+        self._native_frames = [image for image, _ in frames]
+        durations = [max(d / 1000, self.min_tick_period) for _, d in frames]
+        self._frame_ends = list(itertools.accumulate(durations))
+        # Check often enough to catch the shortest frame, but no more than that.
+        self.tick_period = min(durations)
+        self._frame = None
         super().mount(deck, index)
 
-    async def update(self, deck: Deck, index: int):
-        while self._mounted:
-            image, delay = next(self._native_frames)
-            deck.set_key_image(index, image)
-            await asyncio.sleep(delay / 1000)
+    def tick(self, deck: Deck, index: int) -> None:
+        # Work the frame out from the wall clock, so every key showing the same
+        # animation stays in step and a late tick catches up rather than lagging.
+        elapsed = time.time() % self._frame_ends[-1]
+        frame = bisect.bisect_right(self._frame_ends, elapsed)
+        frame = min(frame, len(self._native_frames) - 1)
+        if frame != self._frame:
+            self._frame = frame
+            deck.set_key_image(index, self._native_frames[frame])
@@ -1,22 +1,38 @@
 import asyncio
-import time
+import math
 
-from typing import Optional
+from typing import Callable, Optional
 
 from PIL import Image, ImageColor, ImageDraw
 
 from ..deck import Deck, Scene
+from ..sprites import SpriteAnimation
 from .base import Key
 
 
 class MenuKey(Key):
-    def __init__(self, key: Key, scene: Optional[Scene] = None, **kwargs):
+    def __init__(
+        self,
+        key: Key,
+        scene: Optional[Scene] = None,
+        easing: Optional[Callable[[float], float]] = None,
+        **kwargs,
+    ):
         super().__init__(key=key, **kwargs)
         self._scene = scene
+        self._easing = easing
+
+    def mount(self, deck: Deck, index: int) -> None:
+        super().mount(deck, index)
+        # Get the transition and the next scene ready before anyone presses us.
+        if self._scene is not None:
+            deck.preload(self._scene)
+            scene = MenuAnimationScene(self, index, self._scene, self._easing)
+            deck.warm(scene.frames, deck)
 
     async def on_press(self, deck, index):
         await super().on_press(deck, index)
-        deck.push_scene(MenuAnimationScene(self, index, self._scene))
+        deck.push_scene(MenuAnimationScene(self, index, self._scene, self._easing))
 
 
 class PopSceneKey(Key):
@@ -25,31 +41,50 @@ class PopSceneKey(Key):
         deck.pop_scene()
 
 
+def linear(t: float) -> float:
+    return t
+
+
+def ease_in_out(t: float) -> float:
+    return t * t * (3 - 2 * t)
+
+
+def ease_out(t: float) -> float:
+    return 1 - (1 - t) ** 3
+
+
+# Stable names so frames built with these can persist in the frame cache.
+linear.easing_name = "linear"
+ease_in_out.easing_name = "ease_in_out"
+ease_out.easing_name = "ease_out"
+
+
 class MenuAnimationScene(Scene):
     animation_speed = 0.000000004
+    # Seconds between animation frames.
+    frame_interval = 0.016
     background_color = ImageColor.getrgb("black")
     line_color = ImageColor.getrgb("white")
-
-    _animation_image: Optional[Image.Image]
-    _draw: Optional[ImageDraw.ImageDraw]
-
-    def __init__(self, origin_key: Key, origin_index: int, next_scene: Optional[Scene]):
+    # Maps linear progress in [0, 1) to tween progress.
+    # An `easing_name` attribute on it lets cached frames persist across restarts.
+    easing = staticmethod(linear)
+
+    def __init__(
+        self,
+        origin_key: Key,
+        origin_index: int,
+        next_scene: Optional[Scene],
+        easing: Optional[Callable[[float], float]] = None,
+    ):
         super().__init__()
         self._origin_key = origin_key
         self._origin_index = origin_index
         self._next_scene = next_scene
+        if easing is not None:
+            self.easing = easing
         self._task = None
 
     def mount(self, deck: Deck) -> None:
-        # Create the overall image canvas.
-        self._animation_image = Image.new(
-            "RGB",
-            (
-                deck.key_size[0] * deck.key_layout[1],
-                deck.key_size[1] * deck.key_layout[0],
-            ),
-        )
-        self._draw = ImageDraw.Draw(self._animation_image)
         # Spawn the update task.
         if self._task is None:
             self._task = asyncio.ensure_future(self.update(deck))
@@ -60,59 +95,46 @@ class MenuAnimationScene(Scene):
             self._task.cancel()
             self._task = None
 
-    async def update(self, deck: Deck) -> None:
+    def sprite(self, deck: Deck) -> SpriteAnimation:
+        """The transition as a sprite, shared by every transition like it.
+
+        It only depends on the origin, direction and deck geometry, so the frames are
+        built once.
+        """
+        duration = 1 / (self.animation_speed * 1_000_000_000)
+        count = math.ceil(duration / self.frame_interval)
         # Work out the start and end states to tween.
         start_rect = deck.key_rect(self._origin_index)
-        end_rect = (
-            0,  # left
-            0,  # top
-            self._animation_image.width,  # right
-            self._animation_image.height,  # bottom
-        )
+        end_rect = (0, 0, *deck.canvas_size())
         if self._next_scene is None:
             start_rect, end_rect = end_rect, start_rect
 
-        # Simple lerp tween.
-        def tween(v0: float, v1: float, t: float) -> float:
-            return v0 + t * (v1 - v0)
-
-        # Compte all the crop rects for each key.
-        crop_rects = [deck.key_rect(i) for i in range(deck.key_count)]
-
-        start_time = time.monotonic_ns()
-        completion = 0.0
-        while True:
-            # Update the completion percentage.
-            elapsed = time.monotonic_ns() - start_time
-            completion = elapsed * self.animation_speed
-            if completion >= 1:
-                # We're done!
-                break
-            # Draw the new overall image.
-            self._draw.rectangle(
-                (
-                    0,
-                    0,
-                    self._animation_image.width + 1,
-                    self._animation_image.height + 1,
-                ),
-                self.background_color,
-                None,
-                0,
+        def draw(frame: int) -> Image.Image:
+            image = Image.new("RGB", deck.canvas_size(), self.background_color)
+            t = self.easing(frame / count)
+            tween_rect = tuple(
+                v0 + t * (v1 - v0) for v0, v1 in zip(start_rect, end_rect)
             )
-            # Just use a linear tween for now.
-            tween_rect = (
-                tween(start_rect[0], end_rect[0], completion),
-                tween(start_rect[1], end_rect[1], completion),
-                tween(start_rect[2], end_rect[2], completion),
-                tween(start_rect[3], end_rect[3], completion),
-            )
-            self._draw.rectangle(tween_rect, None, self.line_color, 2)
-            # Blit to all key images.
-            for i, crop_rect in enumerate(crop_rects):
-                deck.set_key_image(i, self._animation_image.crop(crop_rect))
-            # Zzzz.
-            await asyncio.sleep(0.016)
+            ImageDraw.Draw(image).rectangle(tween_rect, None, self.line_color, 2)
+            return image
+
+        name = (
+            "menu",
+            self._next_scene is None,
+            start_rect,
+            end_rect,
+            self.background_color,
+            self.line_color,
+            getattr(self.easing, "easing_name", None) or self.easing,
+        )
+        return SpriteAnimation(name, draw, count)
+
+    def frames(self, deck: Deck) -> tuple[dict[int, bytes], ...]:
+        return self.sprite(deck).frames(deck)
+
+    async def update(self, deck: Deck) -> None:
+        sprite = self.sprite(deck)
+        await sprite.play(deck, sprite.steps * self.frame_interval, repeat=False)
 
         # Animation complete, advance.
         deck.clear()
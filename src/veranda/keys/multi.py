@@ -1,9 +1,10 @@
 import weakref
 
-from typing import Optional
+from typing import Optional, Union
 
 from PIL import Image
 
+from ..assets import assets
 from ..deck import Deck
 from .base import Key
 
@@ -14,14 +15,12 @@ class MultiKey(Key):
         key: Optional[Key] = None,
         width: Optional[int] = None,
         height: Optional[int] = None,
-        image: Optional[Image.Image] = None,
+        image: Union[Image.Image, str, None] = None,
         **kwargs
     ):
         super().__init__(key=key, **kwargs)
         self._width = width
         self._height = height
-        if isinstance(image, str):
-            image = Image.open(image).convert("RGB")
         self._initial_image = image
         self._rect = None
         self._image = None
@@ -48,6 +47,8 @@ class MultiKey(Key):
         size = (self._rect[2] - self._rect[0], self._rect[3] - self._rect[1])
         if self._initial_image is None:
             self._image = Image.new("RGB", size)
+        elif isinstance(self._initial_image, str):
+            self._image = assets.resized(self._initial_image, size)
         else:
             self._image = self._initial_image.resize(size)
         super().mount(deck, index)
@@ -75,8 +76,14 @@ class MultiKey(Key):
             else:
                 self._image = image
         # Repaint all the keys.
-        for index, rect in self._key_crop_rects.items():
-            deck.set_key_image(index, self._image.crop(rect))
+        deck.render(index, self._tiles, deck, self._image, index)
+
+    def _tiles(
+        self, deck: Deck, image: Image.Image, index: int
+    ) -> dict[int, Image.Image]:
+        # A method of the key rather than deck.tiles, so render timings are labelled
+        # with this key's class.
+        return deck.tiles(image, index)
 
 
 class MultiKeyProxy(Key):
@@ -1,12 +1,27 @@
-import asyncio
+import time
 
+from ..series import Series
 from .base import Key
 from .chart import SparklineKey
+from .multi import MultiKeyProxy
 from .text import TextKey
 from .url import GrafanaExploreURLKey
 
 
 class PrometheusKey(Key):
+    # Seconds between polls.
+    interval = 30
+
+    # Longest time between polls when backing off.
+    max_interval = 600
+
+    # Polls in a row returning the same value before polling less often.
+    stable_polls = 3
+
+    # Factor the time between polls grows by per error, or per stable poll after
+    # stable_polls.
+    backoff = 2
+
     def __init__(self, prom, query, key, **kwargs):
         super().__init__(
             key=GrafanaExploreURLKey("https://grafana.mysugarcube.com", query, key),
@@ -14,12 +29,63 @@ class PrometheusKey(Key):
         )
         self._prom = prom
         self._query = query
+        self._reset()
+
+    @property
+    def tick_period(self):
+        # Every key polling at the same interval wakes together, so identical
+        # queries collapse into one request.
+        return self._period
 
-    async def update(self, deck, index):
-        while True:
+    def mount(self, deck, index):
+        # Someone is looking again, start from fresh.
+        self._reset()
+        super().mount(deck, index)
+
+    async def on_press(self, deck, index):
+        # Refresh straight away and go back to the normal interval.
+        self._reset()
+        tick = self._tasks.get("tick")
+        if tick is not None:
+            deck.ticks.reschedule(tick, self._period, time.time())
+        await super().on_press(deck, index)
+
+    async def tick(self, deck, index):
+        if not deck.brightness:
+            # The deck is off, nobody can see the value.
+            return
+        try:
             to_set = await self.query()
-            await self.set_value(deck, index, **to_set)
-            await asyncio.sleep(30)
+        except Exception:
+            self._errors += 1
+            self._set_period(deck, self.interval * self.backoff**self._errors)
+            raise
+        self._errors = 0
+        if to_set is None:
+            # Nothing was fetched, so this says nothing about the value settling.
+            return
+        if to_set == self._last:
+            self._unchanged += 1
+            slowdown = max(self._unchanged - self.stable_polls + 1, 0)
+            self._set_period(deck, self.interval * self.backoff**slowdown)
+            return
+        self._last = to_set
+        self._unchanged = 0
+        self._set_period(deck, self.interval)
+        await self.set_value(deck, index, **to_set)
+
+    def _reset(self):
+        self._period = self.interval
+        self._errors = 0
+        self._unchanged = 0
+        self._last = None
+
+    def _set_period(self, deck, period):
+        period = min(period, self.max_interval)
+        tick = self._tasks.get("tick")
+        if period != self._period and tick is not None:
+            deck.ticks.reschedule(tick, period)
+        self._period = period
 
     async def query(self):
         raise NotImplementedError
@@ -27,7 +93,8 @@ class PrometheusKey(Key):
 
 class PrometheusSingleStatKey(PrometheusKey):
     def __init__(self, prom, query, label, **kwargs):
-        key = TextKey("", label)
+        # Placeholder until the first query comes back.
+        key = TextKey("…", label)
         super().__init__(prom, query, key, **kwargs)
 
     async def query(self):
@@ -42,7 +109,87 @@ class PrometheusSparklineKey(PrometheusKey):
     def __init__(self, prom, query, label, **kwargs):
         key = SparklineKey([0, 0], label)
         super().__init__(prom, query, key, **kwargs)
+        self._series = Series.shared(prom, query)
+        self._fetches = 0
 
     async def query(self):
-        values = await self._prom.range(self._query)
+        values = await self._series.refresh(self._prom)
+        series = self._series
+        fetches = series.full_refreshes + series.partial_refreshes
+        if fetches == self._fetches and self._last is not None:
+            # Served from the newest bucket until the next step, the same values
+            # again don't mean the query has gone quiet.
+            return None
+        self._fetches = fetches
         return {"values": values}
+
+
+class PrometheusGroupKey(PrometheusKey):
+    """One query by label spread over `count` keys from the one it is mounted at.
+
+    The `count` largest values are shown. A label keeps its key for as long as it
+    stays in that top set, so values don't jump around between refreshes, and every
+    key is drawn in one render pass.
+    """
+
+    def __init__(
+        self,
+        prom,
+        query,
+        label,
+        count,
+        format=lambda value: f"{value:.2f}",
+        **kwargs,
+    ):
+        super().__init__(prom, query, None)
+        self._label = label
+        self._count = count
+        self._format = format
+        self._text_kwargs = kwargs
+        self._indexes = []
+        # Which label is shown on each key.
+        self._slots = {}
+        self._values = {}
+
+    def mount(self, deck, index):
+        self._indexes = list(range(index, min(index + self._count, deck.key_count)))
+        for sub_index in self._indexes[1:]:
+            deck[sub_index] = MultiKeyProxy(self)
+        super().mount(deck, index)
+
+    def unmount(self, deck, index):
+        for sub_index in self._indexes[1:]:
+            deck[sub_index] = None
+        super().unmount(deck, index)
+
+    async def query(self):
+        return {"values": await self._prom.instant_by_label(self._query, self._label)}
+
+    async def set_value(self, deck, index, values):
+        values = {label: float(value) for label, value in values.items()}
+        top = sorted(values, key=values.get, reverse=True)[: len(self._indexes)]
+        # Keep labels where they were, and fill the gaps with the newcomers in order.
+        slots = {i: label for i, label in self._slots.items() if label in top}
+        placed = set(slots.values())
+        free = (i for i in self._indexes if i not in slots)
+        for label in top:
+            if label not in placed:
+                slots[next(free)] = label
+        self._slots = slots
+        self._values = values
+        self.draw(deck, index)
+
+    def draw(self, deck, index):
+        deck.render(index, self.render, deck)
+
+    def render(self, deck):
+        slots, values = self._slots, self._values
+        images = {}
+        for index in self._indexes:
+            label = slots.get(index)
+            if label is None:
+                images[index] = None
+            else:
+                key = TextKey(self._format(values[label]), label, **self._text_kwargs)
+                images[index] = key.render(deck)
+        return images
@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import time
+
+from typing import Any, Callable, Optional
+
+from ..deck import Deck
+from ..sources import Source
+from .base import Key
+from .chart import SparklineKey
+from .text import TextKey
+
+
+class StreamKey(Key):
+    """Shows the latest value pushed on a Source topic.
+
+    Values can arrive much faster than the deck refreshes, so only the newest one is
+    drawn, at most once per frame.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        topic: str,
+        key: Key,
+        convert: Optional[Callable[[Any], dict]] = None,
+        **kwargs,
+    ):
+        super().__init__(key=key, **kwargs)
+        self._source = source
+        self._topic = topic
+        if convert is not None:
+            self.convert = convert
+        self._value = None
+        self._handle = None
+        self._last_draw = 0.0
+        self._unsubscribe = None
+        self.received = 0
+        self.coalesced = 0
+
+    def convert(self, value: Any) -> dict:
+        """Turn a value into keyword arguments for set_value()."""
+        return {"text": str(value)}
+
+    def mount(self, deck: Deck, index: int) -> None:
+        super().mount(deck, index)
+        self._unsubscribe = self._source.subscribe(
+            self._topic, lambda value: self._received(deck, index, value)
+        )
+
+    def unmount(self, deck: Deck, index: int) -> None:
+        self._unsubscribe()
+        self._unsubscribe = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        super().unmount(deck, index)
+
+    def _received(self, deck: Deck, index: int, value: Any) -> None:
+        self.received += 1
+        self._value = value
+        if self._handle is not None:
+            # Already drawing on the next frame, it'll pick this value up.
+            self.coalesced += 1
+            return
+        delay = 0.0
+        if deck.TARGET_FPS:
+            delay = self._last_draw + (1 / deck.TARGET_FPS) - time.monotonic()
+        self._handle = asyncio.get_running_loop().call_later(
+            max(delay, 0), self._draw_latest, deck, index
+        )
+
+    def _draw_latest(self, deck: Deck, index: int) -> None:
+        self._handle = None
+        self._last_draw = time.monotonic()
+        # A newer value supersedes any draw still in flight. Running it as one of the
+        # key's tasks means unmounting cancels it before it paints over the next scene.
+        if "draw" in self._tasks:
+            self.end_task("draw")
+        self.start_task("draw", self._draw(deck, index))
+        self._tasks["draw"].add_done_callback(self._drawn)
+
+    async def _draw(self, deck: Deck, index: int) -> None:
+        await self.set_value(deck, index, **self.convert(self._value))
+
+    def _drawn(self, task: asyncio.Future) -> None:
+        if self._tasks.get("draw") is task:
+            del self._tasks["draw"]
+        if not task.cancelled() and task.exception() is not None:
+            task.get_loop().call_exception_handler(
+                {
+                    "message": f"Exception drawing {self!r}",
+                    "exception": task.exception(),
+                    "future": task,
+                }
+            )
+
+
+class StreamTextKey(StreamKey):
+    def __init__(
+        self, source: Source, topic: str, label: Optional[str] = None, **kwargs
+    ):
+        super().__init__(source, topic, TextKey("…", label), **kwargs)
+
+
+class StreamSparklineKey(StreamKey):
+    """A sparkline of the last `history` values pushed on a topic."""
+
+    def __init__(
+        self,
+        source: Source,
+        topic: str,
+        label: Optional[str] = None,
+        history: int = 100,
+        **kwargs,
+    ):
+        super().__init__(source, topic, SparklineKey([0, 0], label), **kwargs)
+        self._history = collections.deque(maxlen=history)
+
+    def _received(self, deck: Deck, index: int, value: Any) -> None:
+        # Every value goes in the history, only the drawing is coalesced.
+        self._history.append(float(value))
+        super()._received(deck, index, value)
+
+    def convert(self, value: Any) -> dict:
+        return {"values": list(self._history)}
@@ -1,9 +1,46 @@
+import functools
+
 from PIL import ImageDraw, ImageFont
 from StreamDeck.ImageHelpers.PILHelper import create_image
 
+from ..assets import assets
 from .base import NOT_PRESENT, Key
 
 
+# Fonts are never shrunk below this size to make text fit.
+MIN_FONT_SIZE = 14
+
+
+def getsize(font: ImageFont.FreeTypeFont, text: str) -> tuple[int, int]:
+    # The right and bottom edges, what FreeTypeFont.getsize returned before Pillow 10.
+    _, _, x, y = font.getbbox(text)
+    # The approximated 0.21 correct factor to offset that getsize is based on max glyph height, found via
+    # https://stackoverflow.com/questions/55773962/pillow-how-to-put-the-text-in-the-center-of-the-image
+    return (x, int(y * 1.21))
+
+
+@functools.lru_cache(maxsize=1024)
+def fit_font(
+    path: str, max_size: int, text: str, width: int
+) -> tuple[ImageFont.FreeTypeFont, tuple[int, int]]:
+    """Find the largest font smaller than max_size which fits text inside width.
+
+    Returns the font and the rendered text size. Falls back to MIN_FONT_SIZE if
+    nothing fits.
+    """
+    low, high = MIN_FONT_SIZE, max_size - 1
+    best = MIN_FONT_SIZE
+    while low <= high:
+        size = (low + high) // 2
+        if getsize(assets.font(path, size), text)[0] <= width:
+            best = size
+            low = size + 1
+        else:
+            high = size - 1
+    font = assets.font(path, best)
+    return (font, getsize(font, text))
+
+
 class TextKey(Key):
     def __init__(
         self,
@@ -22,23 +59,25 @@ class TextKey(Key):
         self._text = text
         self._label = label
         self._label_spacing = label_spacing
-        self._font = ImageFont.truetype(f"fonts/{font}", size)
-        self._label_font = self._font.font_variant(
-            size=label_size
-        )  # ImageFont.truetype(f"fonts/{font}", label_size)
+        self._font_path = f"fonts/{font}"
+        self._size = size
+        self._label_size = label_size
         self._color = color
         self._label_color = label_color or color
         self._background = background
 
     def draw(self, deck, index):
+        deck.render(index, self.render, deck)
+
+    def render(self, deck):
         image = create_image(deck, self._background)
         draw = ImageDraw.Draw(image)
         fit_width = image.width - 10
-        font, size = self._fit_font(self._font, self._text, fit_width)
+        font, size = fit_font(self._font_path, self._size, self._text, fit_width)
 
         if self._label:
-            label_font, label_size = self._fit_font(
-                self._label_font, self._label, fit_width
+            label_font, label_size = fit_font(
+                self._font_path, self._label_size, self._label, fit_width
             )
             total_height = size[1] + label_size[1] + self._label_spacing
             label_y = (image.height - total_height) // 2
@@ -51,7 +90,7 @@ class TextKey(Key):
             x = (image.width - size[0]) // 2
             y = (image.height - size[1]) // 2
             draw.text((x, y), self._text, self._color, font)
-        deck.set_key_image(index, image)
+        return image
 
     async def set_value(self, deck, index, text=NOT_PRESENT, color=NOT_PRESENT):
         if text is not NOT_PRESENT:
@@ -66,16 +105,3 @@ class TextKey(Key):
     #     if int(new_text) < 80:
     #         self._color = 'yellow'
     #     await self.set_value(new_text, deck, index)
-
-    def _getsize(self, font, text):
-        x, y = font.getsize(text)
-        # The approximated 0.21 correct factor to offset that getsize is based on max glyph height, found via
-        # https://stackoverflow.com/questions/55773962/pillow-how-to-put-the-text-in-the-center-of-the-image
-        return (x, int(y * 1.21))
-
-    def _fit_font(self, font, text, width):
-        size = None
-        while (size is None or size[0] > width) and font.size >= 15:
-            font = font.font_variant(size=font.size - 1)
-            size = self._getsize(font, text)
-        return (font, size)
@@ -1,4 +1,6 @@
 import asyncio
+import importlib.util
+import logging
 
 from typing import Generator
 from urllib.parse import urljoin
@@ -8,6 +10,9 @@ import httpx
 from kubernetes_asyncio import client, config
 
 
+logger = logging.getLogger(__name__)
+
+
 class KubernetesAuth(httpx.Auth):
     """Auth helper for httpx to pull from a K8s config."""
 
@@ -26,14 +31,57 @@ class KubernetesAuth(httpx.Auth):
 class Kubernetes:
     """A facade for talking to services inside Kubernetes via the apiserver proxy."""
 
+    # Connection pool for the apiserver, reused across all proxied requests.
+    pool_limits = httpx.Limits(
+        max_connections=20, max_keepalive_connections=10, keepalive_expiry=60
+    )
+
+    # Default timeouts for each proxied request.
+    timeout = httpx.Timeout(10, connect=5)
+
+    # Multiplex requests over one connection when the h2 package is installed.
+    http2 = importlib.util.find_spec("h2") is not None
+
+    # Maximum proxied requests in flight, others wait their turn.
+    max_concurrency = 10
+
     def __init__(self, context: str):
         self.context = context
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
         self.config = client.Configuration()
         self.loader = None
         self.reload_task = None
         self.api = None
         self.core_v1 = None
         self.client = None
+        self._load_task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.client is not None
+
+    def start(self) -> asyncio.Future:
+        """Start loading in the background, if not already loaded or loading.
+
+        A failed load is retried on the next call.
+        """
+        task = self._load_task
+        if task is None or (task.done() and (task.cancelled() or task.exception())):
+            task = self._load_task = asyncio.ensure_future(self.load())
+            task.add_done_callback(self._log_load_failure)
+        return task
+
+    async def ensure_loaded(self) -> None:
+        # Shielded so a cancelled caller doesn't abort the load for everyone else.
+        await asyncio.shield(self.start())
+
+    def _log_load_failure(self, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                "Could not load Kubernetes context %s: %s",
+                self.context,
+                task.exception(),
+            )
 
     async def load(self) -> None:
         self.loader = await config.load_kube_config(
@@ -58,13 +106,18 @@ class Kubernetes:
             auth=KubernetesAuth(self.config),
             base_url=urljoin(self.config.host, "api/"),
             verify=ssl_context,
+            limits=self.pool_limits,
+            timeout=self.timeout,
+            http2=self.http2,
         )
 
-    def proxy_request(
+    async def proxy_request(
         self, method: str, name: str, namespace: str, path: str, *args, **kwargs
     ) -> httpx.Response:
         url = f"v1/namespaces/{namespace}/services/{name}/proxy/{path.lstrip('/')}"
-        return self.client.request(method, url, *args, **kwargs)
+        await self.ensure_loaded()
+        async with self._semaphore:
+            return await self.client.request(method, url, *args, **kwargs)
 
     def for_service(self, name: str, namespace: str) -> "ScopedKubernetes":
         return ScopedKubernetes(self, name, namespace)
@@ -78,13 +131,13 @@ class ScopedKubernetes:
         self._name = name
         self._namespace = namespace
 
-    def get(self, path: str, *args, **kwargs) -> httpx.Response:
-        return self._parent.proxy_request(
+    async def get(self, path: str, *args, **kwargs) -> httpx.Response:
+        return await self._parent.proxy_request(
             "GET", self._name, self._namespace, path, *args, **kwargs
         )
 
-    def post(self, path: str, *args, **kwargs) -> httpx.Response:
-        return self._parent.proxy_request(
+    async def post(self, path: str, *args, **kwargs) -> httpx.Response:
+        return await self._parent.proxy_request(
             "POST", self._name, self._namespace, path, *args, **kwargs
         )
 
@@ -93,5 +146,14 @@ dev = Kubernetes("wallspice-develop")
 prod = Kubernetes("wallspice-prod")
 
 
+def start_all() -> None:
+    """Begin connecting to every context in the background."""
+    dev.start()
+    prod.start()
+
+
 async def load_all() -> None:
-    await asyncio.gather(dev.load(), prod.load())
+    """Wait for every context to connect. A context that fails doesn't block the others."""
+    await asyncio.gather(
+        dev.ensure_loaded(), prod.ensure_loaded(), return_exceptions=True
+    )
@@ -0,0 +1,193 @@
+import asyncio
+import bisect
+import contextlib
+import math
+import threading
+import time
+
+from typing import Iterator, Optional
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: "Metric") -> None:
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        # Updated from render pool threads as well as the event loop.
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(dict(key))} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        5,
+        10,
+    )
+
+    def __init__(self, *args, buckets: Optional[tuple] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(key, (list(c), t)) for key, (c, t) in self._values.items()]
+        for key, (counts, total) in values:
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                bucket_labels = _format_labels({**labels, "le": le})
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+RENDER_SECONDS = Histogram(
+    "veranda_render_seconds", "Time spent drawing key images, by key type."
+)
+ENCODE_SECONDS = Histogram(
+    "veranda_encode_seconds", "Time spent converting key images to native format."
+)
+USB_WRITES = Counter("veranda_usb_writes_total", "Key images written to the device.")
+USB_WRITE_BYTES = Counter(
+    "veranda_usb_write_bytes_total", "Bytes of key images written to the device."
+)
+FRAMES_DROPPED = Counter(
+    "veranda_frames_dropped_total", "Key images replaced before they were written."
+)
+FRAMES_SKIPPED = Counter(
+    "veranda_frames_skipped_total", "Key images skipped as identical to the last."
+)
+CALLBACK_SECONDS = Histogram(
+    "veranda_callback_seconds", "Time spent handling key presses and releases."
+)
+LOOP_LAG_SECONDS = Histogram(
+    "veranda_loop_lag_seconds", "How late the event loop ran a scheduled wakeup."
+)
+LOOP_EXCEPTIONS = Counter(
+    "veranda_loop_exceptions_total", "Unhandled exceptions seen by the event loop."
+)
+QUERY_SECONDS = Histogram(
+    "veranda_query_seconds", "Prometheus query latency, by instance."
+)
+QUERY_ERRORS = Counter("veranda_query_errors_total", "Failed Prometheus queries.")
+
+
+async def monitor_loop_lag(interval: float = 0.5) -> None:
+    """Record how far behind schedule the event loop is, forever."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(loop.time() - start - interval, 0))
+
+
+async def serve(
+    host: str = "127.0.0.1", port: int = 9842, registry: Registry = REGISTRY
+) -> asyncio.AbstractServer:
+    """Serve the registry at /metrics over plain HTTP."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            # Drain the headers, we don't care about any of them.
+            while (await reader.readline()).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status = "200 OK"
+                body = registry.render().encode()
+            else:
+                status = "404 Not Found"
+                body = b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
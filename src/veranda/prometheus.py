@@ -1,45 +1,122 @@
+import asyncio
 import datetime
+import itertools
+import time
 
-from typing import List, Union
+from array import array
+from typing import List, Optional, Union
 
 from . import kubernetes
+from .metrics import QUERY_ERRORS, QUERY_SECONDS
+from .utils.cache import TTLCache
 
 
 Number = Union[int, float]
 
 
 class Prometheus:
+    # Seconds to reuse an instant query result for.
+    instant_ttl = 15
+
+    # Maximum number of query results to keep.
+    cache_size = 256
+
     def __init__(self, kubernetes: kubernetes.Kubernetes):
         self._client = kubernetes.for_service("prometheus-operated:web", "prometheus")
+        # Used to label metrics.
+        self.name = f"{type(self).__name__.lower()}-{kubernetes.context}"
+        # Requests currently waiting on a response, by (url, data).
+        self._inflight = {}
+        self._results = TTLCache(self.cache_size, self.instant_ttl)
+        self.requests = 0
+        self.coalesced = 0
 
     async def instant(self, query: str) -> Union[Number, List[Number]]:
-        results = await self._request("query", data={"query": query})
+        results = await self._request("query", {"query": query}, self.instant_ttl)
         values = [d["value"][1] for d in results]
         if len(values) == 1:
             return values[0]
         return values
 
     async def instant_by_label(self, query: str, label: str) -> dict[str, Number]:
-        results = await self._request("query", data={"query": query})
+        results = await self._request("query", {"query": query}, self.instant_ttl)
         return {d["metric"][label]: d["value"][1] for d in results}
 
-    async def range(self, query: str, range=datetime.timedelta(minutes=30), buckets=10):
-        end = datetime.datetime.now()
-        start = end - range
+    async def range(
+        self, query: str, range=datetime.timedelta(minutes=30), buckets=10
+    ) -> array:
         step = float(range.total_seconds() / buckets)
+        # Align to step boundaries so repeated calls within a step share a cache entry
+        # and every caller sees the same buckets.
+        end = time.time() // step * step
+        _, values = await self.range_arrays(
+            query, end - range.total_seconds(), end, step
+        )
+        return values
+
+    async def range_arrays(
+        self, query: str, start: float, end: float, step: float
+    ) -> tuple[array, array]:
+        """Run a range query and return its timestamps and values as arrays of doubles."""
         params = {
             "query": query,
-            "start": str(int(start.timestamp())),
-            "end": str(int(end.timestamp())),
+            "start": str(start),
+            "end": str(end),
             "step": str(step),
         }
-        results = await self._request("query_range", params)
+        # Good until the next step boundary moves the window along.
+        ttl = end + step - time.time()
+        results = await self._request("query_range", params, ttl)
         if len(results) != 1:
             raise Exception(f"Got {len(results)} results")
-        return [float(d[1]) for d in results[0]["values"]]
+        # The samples are [timestamp, "value"] pairs, flatten them straight in.
+        samples = array(
+            "d", map(float, itertools.chain.from_iterable(results[0]["values"]))
+        )
+        return samples[0::2], samples[1::2]
+
+    def cache_stats(self) -> dict[str, int]:
+        return {
+            **self._results.stats(),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+        }
 
-    async def _request(self, url: str, data: dict) -> Union[dict, list]:
-        """Make a request to the Prometheus API."""
+    async def _request(
+        self, url: str, data: dict, ttl: Optional[float] = None
+    ) -> Union[dict, list]:
+        """Make a request to the Prometheus API.
+
+        Results are cached for ttl seconds if given. If an identical request is
+        already in flight, wait for its result instead of sending another.
+        """
+        key = (url, tuple(sorted(data.items())))
+        if ttl:
+            results = self._results.get(key)
+            if results is not None:
+                return results
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._fetch(url, data))
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller being cancelled doesn't fail the others.
+        results = await asyncio.shield(future)
+        if ttl:
+            self._results.set(key, results, ttl)
+        return results
+
+    async def _fetch(self, url: str, data: dict) -> Union[dict, list]:
+        self.requests += 1
+        try:
+            with QUERY_SECONDS.time(instance=self.name):
+                return await self._post(url, data)
+        except Exception:
+            QUERY_ERRORS.inc(instance=self.name)
+            raise
+
+    async def _post(self, url: str, data: dict) -> Union[dict, list]:
         response = await self._client.post(f"api/v1/{url}", data=data)
         response.raise_for_status()
         data = response.json()
@@ -61,7 +138,6 @@ thanos_dev = Thanos(kubernetes.dev)
 thanos_prod = Thanos(kubernetes.prod)
 
 if __name__ == "__main__":
-    import asyncio
 
     async def main():
         values = await dev.range("sum(container_memory_working_set_bytes)")
@@ -0,0 +1,361 @@
+import asyncio
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import threading
+import time
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from PIL import Image, ImageChops
+from StreamDeck.ImageHelpers.PILHelper import to_native_format
+
+from .metrics import (
+    ENCODE_SECONDS,
+    FRAMES_DROPPED,
+    FRAMES_SKIPPED,
+    RENDER_SECONDS,
+    USB_WRITE_BYTES,
+    USB_WRITES,
+)
+from .utils.cache import LRUCache
+
+
+def image_digest(image: Any) -> bytes:
+    """Return a digest of a key image, either a PIL image, native bytes or None."""
+    digest = hashlib.blake2b(digest_size=16)
+    if image is None:
+        digest.update(b"blank")
+    elif isinstance(image, Image.Image):
+        digest.update(f"{image.mode}:{image.size}".encode())
+        digest.update(image.tobytes())
+    else:
+        digest.update(b"native:")
+        digest.update(bytes(image))
+    return digest.digest()
+
+
+def format_key(image_format: dict) -> tuple:
+    """Return a hashable version of a deck's key image format."""
+    return (
+        tuple(image_format["size"]),
+        image_format["format"],
+        tuple(image_format["flip"]),
+        image_format["rotation"],
+    )
+
+
+class FrameCache:
+    """A process-wide store of pre-encoded frame sequences.
+
+    Sequences are shared by everything asking for the same key, and are optionally
+    persisted as pickles under `path` so they survive restarts. Only keys made of
+    plain data (strings, numbers, bytes and tuples of them) are persisted.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._sequences = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Iterable]) -> tuple:
+        frames = self._sequences.get(key)
+        if frames is None:
+            frames = self._load(key)
+            if frames is None:
+                self.misses += 1
+                frames = tuple(build())
+                self._save(key, frames)
+            else:
+                self.hits += 1
+            self._sequences[key] = frames
+        else:
+            self.hits += 1
+        return frames
+
+    def clear(self) -> None:
+        self._sequences.clear()
+
+    @classmethod
+    def _persistable(cls, key: Hashable) -> bool:
+        # Only plain data has a repr that is stable across restarts.
+        if isinstance(key, tuple):
+            return all(cls._persistable(part) for part in key)
+        return key is None or isinstance(key, (str, bytes, int, float))
+
+    def _filename(self, key: Hashable) -> str:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.path, f"{digest}.pickle")
+
+    def _load(self, key: Hashable) -> Optional[tuple]:
+        if self.path is None or not self._persistable(key):
+            return None
+        try:
+            with open(self._filename(key), "rb") as f:
+                stored_key, frames = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        # Guard against digest collisions and stale files.
+        if stored_key != key:
+            return None
+        return frames
+
+    def _save(self, key: Hashable, frames: tuple) -> None:
+        if self.path is None or not self._persistable(key):
+            return
+        os.makedirs(self.path, exist_ok=True)
+        filename = self._filename(key)
+        # Write then rename so a crash never leaves a truncated file behind.
+        with open(f"{filename}.tmp", "wb") as f:
+            pickle.dump((key, frames), f)
+        os.replace(f"{filename}.tmp", filename)
+
+
+frame_cache = FrameCache()
+
+
+class FrameWriter:
+    """Converts key images to the device's native format and writes them.
+
+    Frames identical to what a key already shows are skipped entirely, and encoded
+    images are cached by content so repeated frames are only converted once. With a
+    tolerance, frames where no channel of any pixel moved by more than that are
+    skipped too.
+    """
+
+    def __init__(self, device, cache_size: int = 256, tolerance: int = 0):
+        self._device = device
+        self._encoded = LRUCache(cache_size)
+        self.tolerance = tolerance
+        self._key_digests = {}
+        # What each key shows, only kept when comparing with a tolerance.
+        self._key_images = {}
+        # Writes may come from the render pool and from close() on the main thread.
+        self._lock = threading.Lock()
+        self.frames_skipped = 0
+        self.frames_written = 0
+
+    def encode(self, image: Any, digest: Optional[bytes] = None) -> Any:
+        """Convert a PIL image to native bytes, using the cache when possible."""
+        if not isinstance(image, Image.Image):
+            return image
+        if digest is None:
+            digest = image_digest(image)
+        native = self._encoded.get(digest)
+        if native is None:
+            with ENCODE_SECONDS.time():
+                native = to_native_format(self._device, image)
+            self._encoded[digest] = native
+        return native
+
+    def prepare(self, image: Any) -> None:
+        """Encode an image ahead of time, so writing it later skips the conversion.
+
+        Unlike write() this may run alongside other writes, e.g. from another thread.
+        """
+        if not isinstance(image, Image.Image):
+            return
+        digest = image_digest(image)
+        with self._lock:
+            if digest in self._encoded:
+                return
+        with ENCODE_SECONDS.time():
+            native = to_native_format(self._device, image)
+        with self._lock:
+            self._encoded[digest] = native
+
+    def write(self, index: int, image: Any) -> None:
+        digest = image_digest(image)
+        with self._lock:
+            if self._unchanged(index, image, digest):
+                self.frames_skipped += 1
+                FRAMES_SKIPPED.inc()
+                return
+            native = self.encode(image, digest)
+            self._device.set_key_image(index, native)
+            self._key_digests[index] = digest
+            if self.tolerance:
+                self._key_images[index] = image
+            self.frames_written += 1
+            USB_WRITES.inc()
+            if native is not None:
+                USB_WRITE_BYTES.inc(len(native))
+
+    def _unchanged(self, index: int, image: Any, digest: bytes) -> bool:
+        if self._key_digests.get(index) == digest:
+            return True
+        if not self.tolerance or not isinstance(image, Image.Image):
+            return False
+        # Compare against what is on the key rather than the last skipped frame, so
+        # slow fades still get written once they add up.
+        shown = self._key_images.get(index)
+        if not isinstance(shown, Image.Image):
+            return False
+        if shown.size != image.size or shown.mode != image.mode:
+            return False
+        extrema = ImageChops.difference(shown, image).getextrema()
+        if not isinstance(extrema[0], tuple):
+            extrema = (extrema,)
+        return max(high for _, high in extrema) <= self.tolerance
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "frames_written": self.frames_written,
+            "frames_skipped": self.frames_skipped,
+            "cache_size": len(self._encoded),
+            "cache_hits": self._encoded.hits,
+            "cache_misses": self._encoded.misses,
+            "cache_evictions": self._encoded.evictions,
+        }
+
+
+class RenderScheduler:
+    """Coalesces key images and writes them to the device at most once per frame tick.
+
+    Images set for a key that has not been flushed yet replace the older one, so
+    superseded frames are never converted or sent over USB. When given an executor
+    the writes (and so the encoding) run there, one batch at a time.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[int, Any], None],
+        fps: Optional[float] = 30,
+        executor: Optional[Executor] = None,
+    ):
+        self._write = write
+        self.fps = fps
+        self._executor = executor
+        self._pending = {}
+        self._handle = None
+        self._flushing = None
+        self._last_flush = 0.0
+        self.frames_dropped = 0
+        self.flushes = 0
+
+    def schedule(self, index: int, image: Any) -> None:
+        if index in self._pending:
+            self.frames_dropped += 1
+            FRAMES_DROPPED.inc()
+        self._pending[index] = image
+        if self._handle is not None or self._flushing is not None:
+            # Already waiting on a tick, or the running flush will reschedule.
+            return
+        if not self.fps:
+            # Coalescing is disabled, write straight through.
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (e.g. during atexit), nothing would ever flush so do it now.
+            self.flush()
+            return
+        delay = self._last_flush + (1 / self.fps) - time.monotonic()
+        self._handle = loop.call_later(max(delay, 0), self._tick)
+
+    def flush(self) -> None:
+        """Write all pending images immediately."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._write_all(self._take_pending())
+
+    def _take_pending(self) -> dict:
+        pending, self._pending = self._pending, {}
+        self._last_flush = time.monotonic()
+        return pending
+
+    def _write_all(self, pending: dict) -> None:
+        if pending:
+            self.flushes += 1
+        for index, image in pending.items():
+            self._write(index, image)
+
+    def _tick(self) -> None:
+        self._handle = None
+        if self._executor is None:
+            self.flush()
+            return
+        loop = asyncio.get_running_loop()
+        self._flushing = loop.run_in_executor(
+            self._executor, self._write_all, self._take_pending()
+        )
+        self._flushing.add_done_callback(self._flushed)
+
+    def _flushed(self, future: asyncio.Future) -> None:
+        self._flushing = None
+        if self._pending:
+            self._handle = asyncio.get_running_loop().call_later(
+                max(self._last_flush + (1 / self.fps) - time.monotonic(), 0),
+                self._tick,
+            )
+        # Surface any write errors to the loop's exception handler.
+        if not future.cancelled():
+            future.result()
+
+
+class RenderPool:
+    """Runs key drawing functions, optionally on a pool of worker threads.
+
+    Results are applied in order per key: a result is dropped if a newer one (or a
+    direct image via `invalidate`) has already been applied for that index. With no
+    workers everything runs inline on the event loop, as it always used to.
+    """
+
+    def __init__(self, apply: Callable[[int, Any], None], workers: int = 0):
+        self._apply = apply
+        self.executor = None
+        if workers:
+            self.executor = ThreadPoolExecutor(
+                workers, thread_name_prefix="veranda-render"
+            )
+        self._sequence = itertools.count()
+        self._applied = {}
+
+    def submit(self, index: int, fn: Callable, *args) -> None:
+        loop = None
+        if self.executor is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        if loop is None:
+            result = self._run(fn, *args)
+            self.invalidate(index)
+            self._apply(index, result)
+            return
+        future = loop.run_in_executor(self.executor, self._run, fn, *args)
+        future.add_done_callback(
+            functools.partial(self._done, index, next(self._sequence))
+        )
+
+    @staticmethod
+    def _run(fn: Callable, *args) -> Any:
+        # Label by the key class for key.render(), otherwise by the function itself.
+        owner = getattr(fn, "__self__", None)
+        name = fn.__qualname__ if owner is None else type(owner).__name__
+        with RENDER_SECONDS.time(key=name):
+            return fn(*args)
+
+    def invalidate(self, index: int) -> None:
+        """Mark any in-flight results for index as stale."""
+        self._applied[index] = next(self._sequence)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def _done(self, index: int, sequence: int, future: asyncio.Future) -> None:
+        if future.cancelled():
+            return
+        result = future.result()
+        if sequence < self._applied.get(index, -1):
+            # Something newer already landed on this key.
+            return
+        self._applied[index] = sequence
+        self._apply(index, result)
@@ -0,0 +1,123 @@
+import asyncio
+import datetime
+import time
+import weakref
+
+from array import array
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .prometheus import Prometheus
+
+
+class Series:
+    """A sliding window of samples for a range query, refreshed incrementally.
+
+    After the first full fetch only the samples since the last one are requested
+    and appended. If the tail doesn't line up (missing points, or the window moved
+    past everything held) the whole window is fetched again.
+
+    Samples are kept in fixed-size ring buffers of doubles rather than Python
+    objects, and `shared()` hands every key showing the same query one copy.
+    """
+
+    _shared = weakref.WeakValueDictionary()
+
+    @classmethod
+    def shared(
+        cls,
+        prom: "Prometheus",
+        query: str,
+        range=datetime.timedelta(minutes=30),
+        buckets=10,
+    ) -> "Series":
+        """Return the Series for query on prom, shared while anything holds it."""
+        key = (prom.name, query, range.total_seconds(), buckets)
+        series = cls._shared.get(key)
+        if series is None:
+            series = cls._shared[key] = cls(query, range, buckets)
+        return series
+
+    def __init__(self, query: str, range=datetime.timedelta(minutes=30), buckets=10):
+        self.query = query
+        self.window = range.total_seconds()
+        self.step = self.window / buckets
+        self.capacity = buckets + 1
+        self._timestamps = array("d", bytes(8 * self.capacity))
+        self._values = array("d", bytes(8 * self.capacity))
+        # Position of the oldest sample, and how many are held.
+        self._head = 0
+        self._length = 0
+        self._refreshing = None
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def timestamps(self) -> array:
+        return self._ordered(self._timestamps)
+
+    def values(self) -> array:
+        return self._ordered(self._values)
+
+    def _ordered(self, ring: array) -> array:
+        end = self._head + self._length
+        if end <= self.capacity:
+            return ring[self._head : end]
+        return ring[self._head :] + ring[: end - self.capacity]
+
+    def _last_timestamp(self) -> float:
+        return self._timestamps[(self._head + self._length - 1) % self.capacity]
+
+    def _replace(self, timestamps: array, values: array) -> None:
+        count = min(len(timestamps), self.capacity)
+        self._timestamps[:count] = timestamps[len(timestamps) - count :]
+        self._values[:count] = values[len(values) - count :]
+        self._head = 0
+        self._length = count
+
+    def _extend(self, timestamps: array, values: array) -> None:
+        for ts, value in zip(timestamps, values):
+            position = (self._head + self._length) % self.capacity
+            self._timestamps[position] = ts
+            self._values[position] = value
+            if self._length < self.capacity:
+                self._length += 1
+            else:
+                self._head = (self._head + 1) % self.capacity
+
+    async def refresh(self, prom: "Prometheus") -> array:
+        # Keys sharing the series also share a refresh already under way.
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh(prom))
+            self._refreshing.add_done_callback(self._refreshed)
+        return await asyncio.shield(self._refreshing)
+
+    def _refreshed(self, future: asyncio.Future) -> None:
+        if self._refreshing is future:
+            self._refreshing = None
+
+    async def _refresh(self, prom: "Prometheus") -> array:
+        end = time.time() // self.step * self.step
+        start = end - self.window
+        if self._length and self._last_timestamp() >= start:
+            last = self._last_timestamp()
+            if last >= end:
+                # Still inside the newest bucket, nothing new to ask for.
+                return self.values()
+            # Overlap by one sample so the previous newest bucket gets its final value.
+            timestamps, values = await prom.range_arrays(
+                self.query, last, end, self.step
+            )
+            expected = round((end - last) / self.step) + 1
+            if len(timestamps) == expected and timestamps[0] == last:
+                self._length -= 1
+                self._extend(timestamps, values)
+                self.partial_refreshes += 1
+                return self.values()
+        timestamps, values = await prom.range_arrays(self.query, start, end, self.step)
+        self._replace(timestamps, values)
+        self.full_refreshes += 1
+        return self.values()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+
+class Source:
+    """A stream of values, pushed to subscribers by topic as they arrive.
+
+    Subclasses implement `run()` to read the stream forever and call `publish()` for
+    each value. It only runs while something is subscribed.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._task = None
+        self.received = 0
+
+    def subscribe(
+        self, topic: str, callback: Callable[[Any], None]
+    ) -> Callable[[], None]:
+        """Call callback(value) for every value published on topic.
+
+        Returns a function which unsubscribes again.
+        """
+        self._subscribers.setdefault(topic, []).append(callback)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+            self._task.add_done_callback(self._stopped)
+
+        def unsubscribe():
+            callbacks = self._subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._subscribers.pop(topic, None)
+            if not self._subscribers and self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+        return unsubscribe
+
+    def _stopped(self, task: asyncio.Future) -> None:
+        # Let the next subscribe() start it again.
+        if self._task is task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            self._report(f"{self!r} stopped", task.exception())
+
+    def _report(self, message: str, exc: BaseException) -> None:
+        asyncio.get_running_loop().call_exception_handler(
+            {"message": message, "exception": exc}
+        )
+
+    def publish(self, topic: str, value: Any) -> None:
+        self.received += 1
+        # Copied as a callback may unsubscribe.
+        for callback in list(self._subscribers.get(topic, ())):
+            # One bad subscriber or value mustn't stop the stream for everyone.
+            try:
+                callback(value)
+            except Exception as exc:
+                self._report(f"Exception in {self!r} subscriber for {topic!r}", exc)
+
+    def publish_many(self, values: dict[str, Any]) -> None:
+        for topic, value in values.items():
+            self.publish(topic, value)
+
+    async def run(self) -> None:
+        raise NotImplementedError
+
+
+class QueueSource(Source):
+    """Values put on an asyncio queue as (topic, value) pairs, e.g. from other tasks."""
+
+    def __init__(self, queue: Optional[asyncio.Queue] = None):
+        super().__init__()
+        self.queue = asyncio.Queue() if queue is None else queue
+
+    async def run(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                topic, value = item
+            except (TypeError, ValueError) as exc:
+                self._report(f"{self!r} skipped {item!r}", exc)
+                continue
+            self.publish(topic, value)
+
+
+class LineSource(Source):
+    """A feed of JSON lines, each an object of {topic: value}, reconnecting on failure."""
+
+    # Seconds to wait before reconnecting, doubling per failure up to max_retry_delay.
+    retry_delay = 1
+    max_retry_delay = 60
+
+    async def run(self) -> None:
+        delay = self.retry_delay
+        while True:
+            try:
+                async for line in self.lines():
+                    delay = self.retry_delay
+                    if line.strip():
+                        self._publish_line(line)
+            except (OSError, httpx.HTTPError) as exc:
+                logger.warning("%s failed, retrying in %ss: %s", self, delay, exc)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _publish_line(self, line: str) -> None:
+        # A bad line is skipped, it doesn't say anything is wrong with the connection.
+        try:
+            values = json.loads(line)
+            if not isinstance(values, dict):
+                raise ValueError(f"expected an object, got {type(values).__name__}")
+        except ValueError as exc:
+            logger.warning("%s skipped a bad line %r: %s", self, line, exc)
+            return
+        self.publish_many(values)
+
+    def lines(self) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class UnixSocketSource(LineSource):
+    """JSON lines read from a local Unix socket."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"UnixSocketSource({self.path!r})"
+
+    async def lines(self) -> AsyncIterator[str]:
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            while line := await reader.readline():
+                yield line.decode()
+        finally:
+            writer.close()
+
+
+class HTTPStreamSource(LineSource):
+    """JSON lines from a long-lived HTTP response, such as a long-poll or event feed."""
+
+    def __init__(self, url: str, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        self.url = url
+        self._client = client
+
+    def __repr__(self) -> str:
+        return f"HTTPStreamSource({self.url!r})"
+
+    async def lines(self) -> AsyncIterator[str]:
+        client = self._client or httpx.AsyncClient(timeout=httpx.Timeout(10, read=None))
+        try:
+            async with client.stream("GET", self.url) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    yield line
+        finally:
+            if self._client is None:
+                await client.aclose()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from typing import Callable, Hashable, Iterator
+
+from PIL import Image
+from StreamDeck.ImageHelpers.PILHelper import to_native_format
+
+from .deck import Deck
+from .render import format_key, frame_cache, image_digest
+
+
+class SpriteAnimation:
+    """An animation of a canvas spanning several keys, played from native frames.
+
+    `draw(step)` returns the canvas for each of `steps` steps. They are all tiled and
+    encoded once, off the event loop, and shared through the frame cache with every
+    animation of the same name on the same kind of deck. Playback then only writes
+    keys which change from one step to the next.
+    """
+
+    def __init__(
+        self,
+        name: Hashable,
+        draw: Callable[[int], Image.Image],
+        steps: int,
+        origin_index: int = 0,
+    ):
+        self.name = name
+        self.draw = draw
+        self.steps = steps
+        self.origin_index = origin_index
+
+    @classmethod
+    def rotation(
+        cls,
+        image: Image.Image,
+        steps: int = 36,
+        origin_index: int = 0,
+        clockwise: bool = True,
+        resample: int = Image.BILINEAR,
+    ) -> "SpriteAnimation":
+        """Spin image through a full turn in steps, e.g. 36 for every 10 degrees."""
+        direction = -1 if clockwise else 1
+
+        def draw(step: int) -> Image.Image:
+            return image.rotate(direction * step * 360 / steps, resample)
+
+        name = ("rotation", image_digest(image), clockwise, resample)
+        return cls(name, draw, steps, origin_index)
+
+    def frames(self, deck: Deck) -> tuple[dict[int, bytes], ...]:
+        """Return the native key images for each step.
+
+        The first step has every key, later ones only the keys that changed since the
+        step before.
+        """
+        cache_key = (
+            "sprite",
+            self.name,
+            self.steps,
+            self.origin_index,
+            format_key(deck.key_image_format()),
+            deck.key_layout,
+            (deck.X_PADDING, deck.Y_PADDING),
+        )
+        return frame_cache.get(cache_key, lambda: self._build_frames(deck))
+
+    def _build_frames(self, deck: Deck) -> Iterator[dict[int, bytes]]:
+        encoded = {}
+        shown = {}
+        for step in range(self.steps):
+            changed = {}
+            for index, tile in deck.tiles(self.draw(step), self.origin_index).items():
+                data = tile.tobytes()
+                if shown.get(index) == data:
+                    continue
+                shown[index] = data
+                # Only encode each look once, e.g. blank corners.
+                native = encoded.get(data)
+                if native is None:
+                    native = encoded[data] = to_native_format(deck._deck, tile)
+                changed[index] = native
+            yield changed
+
+    async def play(self, deck: Deck, period: float, repeat: bool = True) -> None:
+        """Play the animation, taking period seconds per loop, forever if repeat."""
+        frames = await deck.run_in_executor(self.frames, deck)
+        interval = period / self.steps
+        start_time = time.monotonic()
+        shown = 0
+        while repeat or shown < self.steps:
+            # If we fell behind, merge the missed steps rather than replaying them.
+            # Wrapping back to the first step rewrites every key, but the writer skips
+            # the ones that are already showing the right image.
+            due = max(int((time.monotonic() - start_time) / interval) + 1, shown + 1)
+            if not repeat:
+                due = min(due, self.steps)
+            images = {}
+            for step in range(max(shown, due - self.steps), due):
+                images.update(frames[step % self.steps])
+            deck.set_key_images(images)
+            shown = due
+            await asyncio.sleep(
+                max(start_time + shown * interval - time.monotonic(), 0)
+            )
@@ -1,4 +1,11 @@
 import asyncio
+import heapq
+import inspect
+import itertools
+import math
+import time
+
+from typing import Callable, Optional
 
 
 class TasksMixin:
@@ -21,14 +28,187 @@ class TasksMixin:
         self._tasks = {}
 
 
+class Tick:
+    """A periodic callback registered with a TickScheduler."""
+
+    def __init__(self, period: float, phase: float, callback: Callable, args: tuple):
+        self.period = period
+        self.phase = phase
+        self._callback = callback
+        self._args = args
+        self.due = None
+        self.task = None
+        self.cancelled = False
+
+    def next_due(self, now: float) -> float:
+        """Return the first time strictly after now that is on this tick's grid."""
+        periods = math.floor((now - self.phase) / self.period) + 1
+        return self.phase + periods * self.period
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+class TickScheduler:
+    """Runs periodic callbacks for many keys from one shared timer.
+
+    Each callback is due at `phase + n * period` on the wall clock, so everything with
+    the same period and phase wakes together, and a callback due within `jitter`
+    seconds of the current wakeup runs early rather than getting a wakeup of its own.
+
+    Ticks can be registered without a running event loop (e.g. mounting keys from a
+    script before starting one), the timer is then armed by `start()` or the next
+    registration made with the loop running.
+    """
+
+    def __init__(self, jitter: float = 0.01):
+        self.jitter = jitter
+        self._heap = []
+        self._sequence = itertools.count()
+        self._handle = None
+        self._handle_due = None
+        self.wakeups = 0
+        self.calls = 0
+        self.skipped = 0
+
+    def every(
+        self,
+        period: float,
+        callback: Callable,
+        *args,
+        phase: float = 0.0,
+        immediate: bool = True,
+    ) -> Tick:
+        """Call callback(*args) every period seconds until the returned Tick is cancelled.
+
+        If it returns a coroutine that runs as a task, and ticks which come around
+        while it is still running are skipped.
+        """
+        tick = Tick(period, phase, callback, args)
+        now = time.time()
+        self._push(tick, now if immediate else tick.next_due(now))
+        self._arm()
+        return tick
+
+    def reschedule(
+        self, tick: Tick, period: Optional[float] = None, due: Optional[float] = None
+    ) -> None:
+        """Change how often a tick runs, and when it next runs (by default the next
+        point on its grid)."""
+        if tick.cancelled:
+            return
+        if period is not None:
+            tick.period = period
+        self._push(tick, tick.next_due(time.time()) if due is None else due)
+        self._arm()
+
+    def _push(self, tick: Tick, due: float) -> None:
+        tick.due = due
+        heapq.heappush(self._heap, (due, next(self._sequence), tick))
+
+    def start(self) -> None:
+        """Arm the timer for any ticks registered before the event loop was running."""
+        self._arm()
+
+    def _arm(self) -> None:
+        # Drop cancelled ticks so they don't hold a wakeup.
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return
+        due = self._heap[0][0]
+        if self._handle is not None:
+            if self._handle_due <= due:
+                return
+            self._handle.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet, nothing could fire. Wait to be armed with one running.
+            self._handle = None
+            return
+        self._handle = loop.call_later(max(due - time.time(), 0), self._fire)
+        self._handle_due = due
+
+    def _fire(self) -> None:
+        self._handle = None
+        self.wakeups += 1
+        now = time.time()
+        ready = []
+        while self._heap and self._heap[0][0] <= now + self.jitter:
+            due, _, tick = heapq.heappop(self._heap)
+            if tick.cancelled or tick.due != due:
+                continue
+            ready.append(tick)
+        for tick in ready:
+            # Reschedule first so a slow or failing callback keeps its cadence.
+            self._push(tick, tick.next_due(max(now, tick.due)))
+            self._run(tick)
+        self._arm()
+
+    def _run(self, tick: Tick) -> None:
+        if tick.task is not None:
+            self.skipped += 1
+            return
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        try:
+            result = tick._callback(*tick._args)
+        except Exception as exc:
+            loop.call_exception_handler(
+                {"message": "Exception in tick callback", "exception": exc}
+            )
+            return
+        if inspect.isawaitable(result):
+            tick.task = asyncio.ensure_future(result)
+            tick.task.add_done_callback(lambda task: self._done(tick, task))
+
+    def _done(self, tick: Tick, task: asyncio.Future) -> None:
+        if tick.task is task:
+            tick.task = None
+        if not task.cancelled() and task.exception() is not None:
+            task.get_loop().call_exception_handler(
+                {
+                    "message": "Exception in tick callback",
+                    "exception": task.exception(),
+                    "future": task,
+                }
+            )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "ticks": sum(1 for _, _, t in self._heap if not t.cancelled),
+            "wakeups": self.wakeups,
+            "calls": self.calls,
+            "skipped": self.skipped,
+        }
+
+
 class AutoTasksMixin(TasksMixin):
-    """Automatically hook into mount/unmount for the simple case."""
+    """Automatically hook into mount/unmount for the simple case.
+
+    An `update` method runs as a task while mounted, and a `tick` method is called
+    every `tick_period` seconds from the deck's shared TickScheduler.
+    """
+
+    # Seconds between calls to tick(), and their offset from the wall clock grid.
+    tick_period: Optional[float] = None
+    tick_phase = 0.0
 
     def mount(self, *args, **kwargs):
         if hasattr(super(), "mount"):
             super().mount(*args, **kwargs)
         if hasattr(self, "update"):
             self.start_task("update", self.update(*args, **kwargs))
+        if hasattr(self, "tick") and self.tick_period:
+            deck = args[0]
+            # Ticks cancel like tasks, so unmounting pauses them the same way.
+            self._tasks["tick"] = deck.ticks.every(
+                self.tick_period, self.tick, *args, phase=self.tick_phase
+            )
 
     def unmount(self, *args, **kwargs):
         if hasattr(super(), "unmount"):
@@ -0,0 +1,166 @@
+import asyncio
+import io
+import threading
+import time
+
+from typing import Optional
+
+from PIL import Image
+
+
+class VirtualStreamDeck:
+    """A stand-in for a StreamDeck device which keeps everything in memory.
+
+    It implements the parts of the device API that Deck uses, records every key
+    image written to it, and can sleep on each write to mimic USB latency. Use it
+    to run scenes without hardware, e.g. `Deck(VirtualStreamDeck("xl"))`.
+    """
+
+    # key count, (rows, cols), key size, image format, flip, rotation, deck type
+    MODELS = {
+        "mini": (6, (2, 3), (80, 80), "BMP", (False, True), 90, "Stream Deck Mini"),
+        "original": (
+            15,
+            (3, 5),
+            (72, 72),
+            "JPEG",
+            (True, True),
+            0,
+            "Stream Deck Original",
+        ),
+        "xl": (32, (4, 8), (96, 96), "JPEG", (True, True), 0, "Stream Deck XL"),
+    }
+
+    def __init__(
+        self, model: str = "xl", write_latency: float = 0.0, record: bool = True
+    ):
+        (
+            self._key_count,
+            self._key_layout,
+            size,
+            image_format,
+            flip,
+            rotation,
+            self._deck_type,
+        ) = self.MODELS[model]
+        self._image_format = {
+            "size": size,
+            "format": image_format,
+            "flip": flip,
+            "rotation": rotation,
+        }
+        self.write_latency = write_latency
+        self.record = record
+        self.frames = []
+        self.writes = 0
+        self.bytes_written = 0
+        self.brightness = None
+        self._images = [None] * self._key_count
+        self._callback = None
+        self._open = False
+        # Writes may come from render pool threads.
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        self._open = True
+
+    def close(self) -> None:
+        self._open = False
+
+    def is_open(self) -> bool:
+        return self._open
+
+    def connected(self) -> bool:
+        return True
+
+    def id(self) -> str:
+        return f"virtual:{id(self)}"
+
+    def deck_type(self) -> str:
+        return self._deck_type
+
+    def key_count(self) -> int:
+        return self._key_count
+
+    def key_layout(self) -> tuple[int, int]:
+        return self._key_layout
+
+    def key_image_format(self) -> dict:
+        return dict(self._image_format)
+
+    def reset(self) -> None:
+        self._images = [None] * self._key_count
+
+    def set_brightness(self, percent: float) -> None:
+        self.brightness = percent
+
+    def set_key_image(self, key: int, image: Optional[bytes]) -> None:
+        if not 0 <= key < self._key_count:
+            raise IndexError("Invalid key index {}.".format(key))
+        if self.write_latency:
+            # Block like a real USB transfer would.
+            time.sleep(self.write_latency)
+        with self._lock:
+            self._images[key] = image
+            self.writes += 1
+            self.bytes_written += len(image) if image else 0
+            if self.record:
+                self.frames.append((time.monotonic(), key, image))
+
+    def set_key_callback(self, callback) -> None:
+        self._callback = callback
+
+    def set_key_callback_async(self, async_callback, loop=None) -> None:
+        self._callback = async_callback
+
+    async def press(self, key: int) -> None:
+        """Simulate pressing a key."""
+        await self._fire(key, True)
+
+    async def release(self, key: int) -> None:
+        """Simulate releasing a key."""
+        await self._fire(key, False)
+
+    async def _fire(self, key: int, state: bool) -> None:
+        if self._callback is None:
+            return
+        result = self._callback(self, key, state)
+        if asyncio.iscoroutine(result):
+            await result
+
+    def key_image(self, key: int) -> Image.Image:
+        """Decode what a key currently shows back to an upright PIL image."""
+        native = self._images[key]
+        if native is None:
+            return Image.new("RGB", self._image_format["size"])
+        image = Image.open(io.BytesIO(bytes(native))).convert("RGB")
+        # Undo to_native_format's transforms in reverse order.
+        flip_x, flip_y = self._image_format["flip"]
+        if flip_y:
+            image = image.transpose(Image.FLIP_TOP_BOTTOM)
+        if flip_x:
+            image = image.transpose(Image.FLIP_LEFT_RIGHT)
+        if self._image_format["rotation"]:
+            image = image.rotate(-self._image_format["rotation"], expand=True)
+        return image
+
+    def contact_sheet(
+        self, path: Optional[str] = None, padding: int = 10
+    ) -> Image.Image:
+        """Lay out every key's current image as the deck shows them, optionally saving a PNG."""
+        rows, cols = self._key_layout
+        width, height = self._image_format["size"]
+        sheet = Image.new(
+            "RGB",
+            (cols * (width + padding) + padding, rows * (height + padding) + padding),
+            "#333333",
+        )
+        for key in range(self._key_count):
+            y, x = divmod(key, cols)
+            sheet.paste(
+                self.key_image(key),
+                (padding + x * (width + padding), padding + y * (height + padding)),
+            )
+        if path is not None:
+            sheet.save(path, "PNG")
+        return sheet
@@ -0,0 +1,31 @@
+from veranda.bench import compare
+
+
+BASELINE = [
+    {
+        "benchmark": "menu",
+        "model": "xl",
+        "fps": 30.0,
+        "latency_ms_p50": 5.0,
+        "latency_ms_p95": 9.0,
+    }
+]
+
+
+def test_compare_within_tolerance():
+    results = [dict(BASELINE[0], fps=28.0, latency_ms_p95=10.0)]
+    assert compare(results, BASELINE, 0.2) == []
+
+
+def test_compare_reports_stalled_deck():
+    results = [dict(BASELINE[0], fps=0.0, latency_ms_p50=None, latency_ms_p95=None)]
+    regressions = compare(results, BASELINE, 0.2)
+    assert len(regressions) == 3
+    assert any("fps" in r for r in regressions)
+    assert any("latency_ms_p95: 9.00 -> none" in r for r in regressions)
+
+
+def test_compare_skips_missing_baseline():
+    baseline = [dict(BASELINE[0], latency_ms_p50=None, latency_ms_p95=None)]
+    results = [dict(BASELINE[0], latency_ms_p50=50.0)]
+    assert compare(results, baseline, 0.2) == []
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from PIL import Image
+
+from veranda.deck import Deck
+
+
+class PooledDeck(Deck):
+    RENDER_WORKERS = 2
+
+
+def slow_fill(color, delay):
+    time.sleep(delay)
+    return Image.new("RGB", (96, 96), color)
+
+
+def test_newest_render_wins_with_two_in_flight():
+    async def main():
+        deck = PooledDeck.virtual("xl")
+        try:
+            deck.render(0, slow_fill, "red", 0.05)
+            deck.render(0, slow_fill, "blue", 0.1)
+            await asyncio.sleep(0.3)
+            deck.flush()
+            return deck._deck.key_image(0).getpixel((48, 48))
+        finally:
+            deck.close()
+
+    red, green, blue = asyncio.run(main())
+    assert blue > 200 and red < 50
+
+
+def test_direct_image_supersedes_render_in_flight():
+    async def main():
+        deck = PooledDeck.virtual("xl")
+        try:
+            deck.render(0, slow_fill, "red", 0.05)
+            deck.set_key_image(0, Image.new("RGB", (96, 96), "lime"))
+            await asyncio.sleep(0.2)
+            deck.flush()
+            return deck._deck.key_image(0).getpixel((48, 48))
+        finally:
+            deck.close()
+
+    red, green, blue = asyncio.run(main())
+    assert green > 200 and red < 50